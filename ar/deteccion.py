@@ -1,60 +1,437 @@
 import cv2
 import numpy as np
 
-def crear_detector():
+def crear_detector(modo="completo", reescaneo=15, margen=0.5, escala=0.5):
+    """
+    Crea el detector de marcadores ArUco.
+    modo "completo" busca en todo el frame; "roi" sigue los marcadores en las regiones
+    predichas a partir del frame anterior y vuelve a buscar en todo el frame cada `reescaneo` frames;
+    "multiescala" detecta sobre el frame reducido a `escala` y refina las esquinas a resolución completa.
+    "roi_multiescala" combina ambos.
+    """
     diccionario = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_5X5_50)
-    return cv2.aruco.ArucoDetector(diccionario)
+    detector = cv2.aruco.ArucoDetector(diccionario)
+    if "multiescala" in modo:
+        detector = DetectorMultiescala(detector, escala)
+    if "roi" in modo:
+        detector = DetectorSeguimiento(detector, reescaneo, margen)
+    return detector
 
-def detectar_pose(frame, tam, detector, cameraMatrix, distCoeffs):
+class DetectorMultiescala:
+    """
+    Envoltorio de ArucoDetector que detecta sobre una versión reducida del frame
+    y refina las esquinas con precisión subpíxel sobre la imagen a resolución completa.
+    """
+    def __init__(self, detector, escala=0.5, ventana=5):
+        self.detector = detector
+        self.escala = escala
+        self.ventana = ventana  # Semiventana de cornerSubPix en píxeles de resolución completa
+        self._criterio = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 30, 0.01)
+
+    def detectMarkers(self, frame):
+        gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        reducido = cv2.resize(gris, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+        esquinas, ids, rechazados = self.detector.detectMarkers(reducido)
+        if ids is None:
+            return (esquinas, ids, rechazados)
+
+        # Volvemos a coordenadas de resolución completa (centro de píxel a centro de píxel)
+        puntos = (np.concatenate(esquinas).reshape(-1, 1, 2) + 0.5) / self.escala - 0.5
+        alto, ancho = gris.shape[:2]
+        np.clip(puntos[..., 0], 0, ancho - 1, out=puntos[..., 0])
+        np.clip(puntos[..., 1], 0, alto - 1, out=puntos[..., 1])
+        cv2.cornerSubPix(gris, puntos, (self.ventana, self.ventana), (-1, -1), self._criterio)
+        esquinas = tuple(puntos.reshape(-1, 1, 4, 2).astype(np.float32))
+        return (esquinas, ids, rechazados)
+
+class DetectorSeguimiento:
+    """
+    Envoltorio de ArucoDetector que solo busca alrededor de los marcadores del frame anterior.
+    Ofrece la misma interfaz detectMarkers(frame) que el detector original.
+    """
+    MARGEN_MINIMO = 16  # píxeles
+
+    def __init__(self, detector, reescaneo=15, margen=0.5):
+        self.detector = detector
+        self.reescaneo = reescaneo   # Frames entre búsquedas completas
+        self.margen = margen         # Margen alrededor de cada marcador, relativo a su tamaño
+        self.busquedas_completas = 0
+        self._previas = None         # (esquinas, ids) del último frame
+        self._desde_completa = 0
+
+    def reiniciar(self):
+        self._previas = None
+
+    def detectMarkers(self, frame):
+        self._desde_completa += 1
+        if self._previas is None or self._desde_completa >= self.reescaneo:
+            return self._busqueda_completa(frame)
+
+        esquinas, ids = [], []
+        for x1, y1, x2, y2 in self._regiones(frame.shape):
+            c, i, _ = self.detector.detectMarkers(frame[y1:y2, x1:x2])
+            if i is None:
+                continue
+            for esquina, marker_id in zip(c, i.flatten()):
+                if marker_id not in ids:
+                    esquinas.append(esquina + np.array([x1, y1], dtype=np.float32))
+                    ids.append(marker_id)
+
+        # Si se ha perdido algún marcador seguido, volvemos a buscar en todo el frame
+        if not set(self._previas[1].flatten().tolist()) <= set(ids):
+            return self._busqueda_completa(frame)
+
+        resultado = (tuple(esquinas), np.array(ids, dtype=np.int32).reshape(-1, 1))
+        self._previas = resultado
+        return (resultado[0], resultado[1], ())
+
+    def _busqueda_completa(self, frame):
+        esquinas, ids, rechazados = self.detector.detectMarkers(frame)
+        self.busquedas_completas += 1
+        self._desde_completa = 0
+        self._previas = (esquinas, ids) if ids is not None else None
+        return (esquinas, ids, rechazados)
+
+    def _regiones(self, forma):
+        # Rectángulo ampliado de cada marcador, fusionando los que se solapan
+        alto, ancho = forma[:2]
+        rects = []
+        for esquina in self._previas[0]:
+            pts = esquina.reshape(4, 2)
+            x1, y1 = pts.min(axis=0)
+            x2, y2 = pts.max(axis=0)
+            m = max(self.MARGEN_MINIMO, self.margen * max(x2 - x1, y2 - y1))
+            rects.append([max(int(x1 - m), 0), max(int(y1 - m), 0),
+                          min(int(x2 + m) + 1, ancho), min(int(y2 + m) + 1, alto)])
+        fusionados = True
+        while fusionados and len(rects) > 1:
+            fusionados = False
+            for a in range(len(rects)):
+                for b in range(a + 1, len(rects)):
+                    ra, rb = rects[a], rects[b]
+                    if ra[0] < rb[2] and rb[0] < ra[2] and ra[1] < rb[3] and rb[1] < ra[3]:
+                        rects[a] = [min(ra[0], rb[0]), min(ra[1], rb[1]), max(ra[2], rb[2]), max(ra[3], rb[3])]
+                        del rects[b]
+                        fusionados = True
+                        break
+                if fusionados:
+                    break
+        return rects
+
+def detectar_marcadores(frame, detector):
     bboxs, ids, _ = detector.detectMarkers(frame)
-    #print("ids: ", ids)
-    if ids is not None:
-        objPoints = np.array([[-tam/2.0, tam/2.0, 0.0],
-                              [tam/2.0, tam/2.0, 0.0],
-                              [tam/2.0, -tam/2.0, 0.0],
-                              [-tam/2.0, -tam/2.0, 0.0]])
-        resultado = {}
-        ids = ids.flatten()
-        for i in range(len(ids)):
-            imagePoints = bboxs[i].reshape((4, 2)) 
-            ret, rvec, tvec = cv2.solvePnP(objPoints, imagePoints, cameraMatrix, distCoeffs)
+    if ids is None:
+        return (bboxs, None)
+    return (bboxs, ids.flatten())
+
+class PosesMarcadores:
+    """
+    Poses de todos los marcadores de un frame en arrays compactos.
+    ids (N,), rvecs (N, 3) y tvecs (N, 3); pose[marker_id] devuelve (rvec, tvec) como vistas (3, 1).
+    """
+    def __init__(self, ids, rvecs, tvecs):
+        self.ids = ids
+        self.rvecs = rvecs
+        self.tvecs = tvecs
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, marker_id):
+        return bool(np.any(self.ids == marker_id))
+
+    def __getitem__(self, marker_id):
+        i = np.flatnonzero(self.ids == marker_id)
+        if len(i) == 0:
+            raise KeyError(marker_id)
+        return (self.rvecs[i[0]].reshape(3, 1), self.tvecs[i[0]].reshape(3, 1))
+
+    def keys(self):
+        return self.ids.tolist()
+
+    def items(self):
+        return [(marker_id, self[marker_id]) for marker_id in self.ids.tolist()]
+
+class EstimadorPoses:
+    """
+    Estima la pose de todos los marcadores de un frame de una vez.
+    Los puntos del marcador se calculan una sola vez, las esquinas se corrigen de distorsión
+    en una única llamada vectorizada y cada marcador se resuelve con el solver para cuadrados planos.
+    """
+    MAX_MARCADORES = 50  # DICT_5X5_50
+
+    def __init__(self, tam, cameraMatrix, distCoeffs):
+        self.tam = tam
+        self.cameraMatrix = np.asarray(cameraMatrix, dtype=np.float64)
+        self.distCoeffs = np.asarray(distCoeffs, dtype=np.float64)
+        self.objPoints = np.array([[-tam/2.0, tam/2.0, 0.0],
+                                   [tam/2.0, tam/2.0, 0.0],
+                                   [tam/2.0, -tam/2.0, 0.0],
+                                   [-tam/2.0, -tam/2.0, 0.0]])
+        self._identidad = np.eye(3)
+        self._criterio = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 20, 1e-6)
+        self._puntos = np.empty((self.MAX_MARCADORES * 4, 1, 2), dtype=np.float32)
+        self._normalizados = np.empty((self.MAX_MARCADORES * 4, 1, 2), dtype=np.float32)
+
+    def mismos_parametros(self, tam, cameraMatrix, distCoeffs):
+        return (tam == self.tam
+                and np.array_equal(cameraMatrix, self.cameraMatrix)
+                and np.array_equal(distCoeffs, self.distCoeffs))
+
+    def estimar(self, esquinas, ids):
+        if ids is None or len(ids) == 0:
+            return PosesMarcadores(np.empty(0, dtype=np.int32), np.empty((0, 3)), np.empty((0, 3)))
+
+        # detectMarkers devuelve los ids con forma (N, 1): se aplanan para que sean claves enteras
+        ids = np.asarray(ids).ravel()
+        n = min(len(ids), self.MAX_MARCADORES)
+        puntos = self._puntos[:n * 4]
+        np.concatenate([e.reshape(4, 1, 2) for e in esquinas[:n]], out=puntos)
+
+        # Coordenadas normalizadas (sin distorsión): a partir de aquí la cámara es ideal
+        normalizados = self._normalizados[:n * 4]
+        cv2.undistortPointsIter(puntos, self.cameraMatrix, self.distCoeffs, None, None,
+                                self._criterio, normalizados)
+
+        validos = np.zeros(n, dtype=bool)
+        rvecs = np.empty((n, 3))
+        tvecs = np.empty((n, 3))
+        for i in range(n):
+            ret, rvec, tvec = cv2.solvePnP(self.objPoints, normalizados[i*4:i*4+4], self._identidad, None,
+                                           flags=cv2.SOLVEPNP_IPPE_SQUARE)
             if ret:
-                resultado[ids[i]] = (rvec, tvec)
-        return (True, resultado)
+                validos[i] = True
+                rvecs[i] = rvec.ravel()
+                tvecs[i] = tvec.ravel()
+        return PosesMarcadores(np.asarray(ids[:n], dtype=np.int32)[validos], rvecs[validos], tvecs[validos])
+
+    def proyectar(self, poses):
+        """Esquinas en la imagen de cada marcador de `poses`, con la forma (1, 4, 2) de detectMarkers."""
+        return tuple(cv2.projectPoints(self.objPoints, rvec, tvec, self.cameraMatrix, self.distCoeffs)[0]
+                     .reshape(1, 4, 2).astype(np.float32)
+                     for rvec, tvec in zip(poses.rvecs, poses.tvecs))
+
+_estimador = None
+
+def obtener_estimador(tam, cameraMatrix, distCoeffs):
+    global _estimador
+    if _estimador is None or not _estimador.mismos_parametros(tam, cameraMatrix, distCoeffs):
+        _estimador = EstimadorPoses(tam, cameraMatrix, distCoeffs)
+    return _estimador
+
+def estimar_poses(bboxs, ids, tam, cameraMatrix, distCoeffs):
+    return obtener_estimador(tam, cameraMatrix, distCoeffs).estimar(bboxs, ids)
+
+class DeteccionFrame:
+    """
+    Marcadores de un frame concreto, identificado por su número de secuencia.
+    Las esquinas e ids se calculan al crearlo y las poses la primera vez que se piden.
+    """
+    def __init__(self, indice, esquinas, ids, tam, cameraMatrix, distCoeffs, poses=None):
+        self.indice = indice
+        self.esquinas = esquinas
+        self.ids = ids
+        self.tam = tam
+        self.predicha = False   # True si las poses vienen del seguidor y no de una detección
+        self._cameraMatrix = cameraMatrix
+        self._distCoeffs = distCoeffs
+        self._poses = poses
+
+    @classmethod
+    def desde_prediccion(cls, indice, poses, tam, cameraMatrix, distCoeffs):
+        # Las esquinas se proyectan desde la pose predicha para poder ocultar los marcadores
+        esquinas = obtener_estimador(tam, cameraMatrix, distCoeffs).proyectar(poses)
+        deteccion = cls(indice, esquinas, poses.ids, tam, cameraMatrix, distCoeffs, poses)
+        deteccion.predicha = True
+        return deteccion
+
+    @property
+    def ids_visibles(self):
+        return set() if self.ids is None else set(self.ids.tolist())
+
+    def calcular_poses(self):
+        if self._poses is None:
+            self._poses = estimar_poses(self.esquinas, self.ids, self.tam, self._cameraMatrix, self._distCoeffs)
+        return self._poses
+
+    def fijar_poses(self, poses):
+        self._poses = poses
+
+    @property
+    def poses(self):
+        return self.calcular_poses()
+
+def _rvec_a_cuaternion(rvecs):
+    angulos = np.linalg.norm(rvecs, axis=1, keepdims=True)
+    ejes = np.divide(rvecs, angulos, out=np.zeros_like(rvecs), where=angulos > 1e-12)
+    return np.hstack([ejes * np.sin(angulos / 2.0), np.cos(angulos / 2.0)])
+
+def _cuaternion_a_rvec(q):
+    q = q / np.linalg.norm(q, axis=1, keepdims=True)
+    q = np.where(q[:, 3:4] < 0, -q, q)
+    senos = np.linalg.norm(q[:, :3], axis=1, keepdims=True)
+    angulos = 2.0 * np.arctan2(senos, q[:, 3:4])
+    return np.divide(q[:, :3], senos, out=np.zeros_like(q[:, :3]), where=senos > 1e-12) * angulos
+
+class FiltroOneEuro:
+    """
+    Filtro One-Euro (Casiez et al., 2012) sobre un vector: suaviza mucho cuando la señal
+    está quieta y poco cuando se mueve deprisa. Guarda también la derivada filtrada.
+    """
+    def __init__(self, min_cutoff=1.0, beta=1.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x = None
+        self.dx = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def filtrar(self, x, dt):
+        if self.x is None or dt <= 0:
+            self.x = x.copy()
+            self.dx = np.zeros_like(x)
+            return self.x
+        dx = (x - self.x) / dt
+        self.dx += self._alpha(self.d_cutoff, dt) * (dx - self.dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dx)
+        self.x += self._alpha(cutoff, dt) * (x - self.x)
+        return self.x
+
+class SeguidorPoses:
+    """
+    Seguimiento temporal de la pose de cada marcador.
+    Suaviza rvec/tvec con un filtro One-Euro (la rotación se filtra como cuaternión) y
+    extrapola a velocidad constante los marcadores que no se detectan durante un momento,
+    lo que permite detectar a menor frecuencia que la de render.
+    """
+    def __init__(self, min_cutoff=1.0, beta=1.0, d_cutoff=1.0, max_prediccion=0.25):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.max_prediccion = max_prediccion  # Segundos que se mantiene un marcador sin detectarlo
+        self._pistas = {}  # marker_id -> [FiltroOneEuro, instante de la última detección]
+
+    def activo(self):
+        return bool(self._pistas)
+
+    def reiniciar(self):
+        self._pistas.clear()
+
+    def actualizar(self, poses, t):
+        """
+        Incorpora las poses detectadas en el instante t y devuelve las poses filtradas,
+        incluyendo la predicción de los marcadores perdidos hace menos de max_prediccion.
+        """
+        if len(poses):
+            estados = np.hstack([poses.tvecs, _rvec_a_cuaternion(poses.rvecs)])
+            for marker_id, estado in zip(poses.ids.tolist(), estados):
+                pista = self._pistas.get(marker_id)
+                if pista is None:
+                    pista = self._pistas[marker_id] = [FiltroOneEuro(self.min_cutoff, self.beta, self.d_cutoff), t]
+                elif np.dot(pista[0].x[3:], estado[3:]) < 0:
+                    estado[3:] *= -1  # q y -q son la misma rotación: mantenemos la continuidad
+                pista[0].filtrar(estado, t - pista[1])
+                pista[1] = t
+        return self.predecir(t)
+
+    def predecir(self, t):
+        """
+        Poses extrapoladas al instante t a partir del último estado filtrado de cada marcador.
+        """
+        for marker_id in [m for m, (_, t0) in self._pistas.items() if t - t0 > self.max_prediccion]:
+            del self._pistas[marker_id]
+        if not self._pistas:
+            return PosesMarcadores(np.empty(0, dtype=np.int32), np.empty((0, 3)), np.empty((0, 3)))
+
+        ids = np.fromiter(self._pistas.keys(), dtype=np.int32, count=len(self._pistas))
+        estados = np.array([f.x + f.dx * (t - t0) for f, t0 in self._pistas.values()])
+        return PosesMarcadores(ids, _cuaternion_a_rvec(estados[:, 3:]), estados[:, :3].copy())
+
+_ultima_deteccion = None
+
+def detectar_frame(frame, indice, detector, tam, cameraMatrix, distCoeffs):
+    """
+    Devuelve la detección del frame con número de secuencia `indice`.
+    Si ya se calculó para ese frame se reutiliza en lugar de volver a llamar a detectMarkers.
+    """
+    global _ultima_deteccion
+    d = _ultima_deteccion
+    if d is not None and indice is not None and d.indice == indice and d.tam == tam:
+        return d
+    esquinas, ids = detectar_marcadores(frame, detector)
+    _ultima_deteccion = DeteccionFrame(indice, esquinas, ids, tam, cameraMatrix, distCoeffs)
+    return _ultima_deteccion
+
+def ultima_deteccion():
+    return _ultima_deteccion
+
+def detectar_pose(frame, tam, detector, cameraMatrix, distCoeffs, deteccion=None):
+    if deteccion is None:
+        deteccion = detectar_frame(frame, None, detector, tam, cameraMatrix, distCoeffs)
+    #print("ids: ", ids)
+    if deteccion.ids is not None:
+        return (True, deteccion.poses)
     return (False, None)
 
-def ocultar_marcadores_visualmente(frame, detector):
-    bboxs, ids, _ = detector.detectMarkers(frame)
+_mascara_marcadores = None  # Máscara de frame completo reutilizada entre llamadas
+
+def ocultar_marcadores_visualmente(frame, detector, deteccion=None, margen=10, modo="media"):
+    """
+    Tapa los marcadores detectados sobre el frame (in situ).
+    modo "media" rellena cada marcador con el color medio de su entorno;
+    modo "inpaint" reconstruye el fondo con cv2.inpaint limitado a la región de cada marcador.
+    """
+    global _mascara_marcadores
+    if deteccion is None:
+        bboxs, ids = detectar_marcadores(frame, detector)
+    else:
+        bboxs, ids = deteccion.esquinas, deteccion.ids
+    if ids is None or len(bboxs) == 0:
+        return
+
+    alto, ancho = frame.shape[:2]
+    if _mascara_marcadores is None or _mascara_marcadores.shape != (alto, ancho):
+        _mascara_marcadores = np.zeros((alto, ancho), dtype=np.uint8)
+    mascara = _mascara_marcadores
 
-    if ids is not None:
-        for i in range(len(ids)):
-            pts = bboxs[i].astype(int)[0]
-
-            x, y, w, h = cv2.boundingRect(pts)
-            # Expandimos el área alrededor del marcador
-            margin = 10
-            x1 = max(x - margin, 0)
-            y1 = max(y - margin, 0)
-            x2 = min(x + w + margin, frame.shape[1])
-            y2 = min(y + h + margin, frame.shape[0])
-
-            # Crea una máscara vacía (todo ceros) del tamaño del rectángulo que rodea el marcador
-            mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
-            #coordenadas absolutas (en el folio) de los vértices del marcador.
-            pts_local = pts - [x1, y1]
-            #Dibuja (rellena) el polígono del marcador en la máscara con valor 255 (blanco).
-            cv2.fillPoly(mask, [pts_local], 255)
-            #Recorta el frame para obtener sólo la región que rodea al marcador.
+    # Una sola máscara con todos los marcadores
+    poligonos = [np.round(b.reshape(4, 2)).astype(np.int32) for b in bboxs]
+    cv2.fillPoly(mascara, poligonos, 255)
+
+    regiones = []
+    for pts in poligonos:
+        x, y, w, h = cv2.boundingRect(pts)
+        # Expandimos el área alrededor del marcador
+        regiones.append((max(x - margen, 0), max(y - margen, 0),
+                         min(x + w + margen, ancho), min(y + h + margen, alto)))
+
+    if modo == "inpaint":
+        nucleo = np.ones((3, 3), dtype=np.uint8)
+        for x1, y1, x2, y2 in regiones:
+            # Dilatamos un poco para no arrastrar el borde negro del marcador al fondo reconstruido
+            m = cv2.dilate(mascara[y1:y2, x1:x2], nucleo)
+            frame[y1:y2, x1:x2] = cv2.inpaint(frame[y1:y2, x1:x2], m, 3, cv2.INPAINT_TELEA)
+    else:
+        colores = []
+        for x1, y1, x2, y2 in regiones:
+            # Media del entorno sin copiar píxeles: suma total menos la suma dentro de los marcadores
             region = frame[y1:y2, x1:x2]
-            #Selecciona todos los píxeles que no están dentro del marcador (donde la máscara es 0 = negro).
-            background_pixels = region[mask == 0]
-            
-            #Si hay píxeles en el fondo, calcula el color promedio en BGR de esos píxeles (promedio por canal).
-            if len(background_pixels) > 0:
-                avg_color_np = np.mean(background_pixels, axis=0)
-                avg_color = tuple(int(c) for c in avg_color_np)
-            else:
-                avg_color = (0, 0, 0)
-
-            # Dibujamos el polígono resultante sobre el marcador con el color promedio
-            cv2.fillPoly(frame, [pts], color=avg_color)
\ No newline at end of file
+            m = mascara[y1:y2, x1:x2]
+            n_total = region.shape[0] * region.shape[1]
+            n_dentro = cv2.countNonZero(m)
+            if n_total == n_dentro:
+                colores.append((0, 0, 0))
+                continue
+            suma = np.array(cv2.sumElems(region)[:3])
+            suma_dentro = np.array(cv2.mean(region, mask=m)[:3]) * n_dentro
+            colores.append(tuple(int(c) for c in (suma - suma_dentro) / (n_total - n_dentro)))
+        # Dibujamos el polígono de cada marcador con el color medio de su entorno
+        for pts, color in zip(poligonos, colores):
+            cv2.fillPoly(frame, [pts], color=color)
+
+    # Dejamos la máscara limpia para la siguiente llamada
+    cv2.fillPoly(mascara, poligonos, 0)
@@ -1,5 +1,14 @@
-import modules.cuia as cuia
+import time
+import cv2
 import numpy as np
+from collections import OrderedDict
+import pygfx as gfx
+import pylinalg as la
+from wgpu.gui.offscreen import WgpuCanvas
+
+from ar.lectura_gpu import LecturaAsincrona
+from models.cache_assets import estimar_memoria
+from utils.conversiones import pose_opencv_a_pygfx
 
 def fov(cameraMatrix, ancho, alto):
     if ancho > alto:
@@ -10,9 +19,599 @@ def fov(cameraMatrix, ancho, alto):
         fov_rad = 2 * np.arctan(ancho / (2 * f))
     return np.rad2deg(fov_rad)
 
-def crear_escena(modelo, cameraMatrix, ancho, alto):
-    escena = cuia.escenaPYGFX(fov(cameraMatrix, ancho, alto), ancho, alto)
-    escena.agregar_modelo(modelo)
-    escena.ilumina_modelo(modelo)
-    escena.iluminar()
-    return escena
+# Direcciones (x, y, z) e intensidad relativa de las luces del montaje por defecto
+LUCES_ESTANDAR = [
+    ((1, 1, 1), 1.0),    # Superior derecha frontal
+    ((1, -1, 1), 1.0),   # Inferior derecha frontal
+    ((-1, 1, 1), 1.0),   # Superior izquierda frontal
+    ((-1, -1, 1), 1.0),  # Inferior izquierda frontal
+    ((1, 1, -1), 1.0),   # Superior derecha trasera
+    ((1, -1, -1), 1.0),  # Inferior derecha trasera
+    ((-1, 1, -1), 1.0),  # Superior izquierda trasera
+    ((-1, -1, -1), 1.0), # Inferior izquierda trasera
+    ((0, 2, 0), 0.8),    # Luz cenital adicional
+    ((0, -1, 2), 1.2),   # Luz frontal adicional
+]
+
+# Montajes de luces por calidad: (luces direccionales, intensidad de la luz ambiente).
+# "completa" es el montaje de siempre (ilumina_modelo + iluminar: ambiente 0.4 + 1.0).
+# Cada luz direccional se evalúa en el shader de cada fragmento; los montajes reducidos
+# reparten su intensidad entre menos luces y más luz ambiente para que el brillo de las caras
+# vistas de frente y el brillo medio de las caras visibles coincidan con los del completo.
+ILUMINACION_PRESETS = {
+    "completa": (LUCES_ESTANDAR, 1.4),
+    "ligera": ([
+        ((1, 1, 2), 1.43),      # Principal, desde arriba a la derecha
+        ((-1, -0.5, 1), 0.72),  # Relleno, desde abajo a la izquierda
+    ], 5.74),
+    "minima": ([
+        ((0, 0.5, 1), 1.7),  # Una sola luz desde la cámara
+    ], 6.05),
+}
+
+
+def crear_iluminacion(calidad="completa", intensidad=2.5):
+    """
+    Luces de la escena compartida. Se crean una sola vez y alumbran a todos los modelos,
+    en lugar de añadir un juego completo de luces por cada escena.
+    Las direcciones están en el espacio de la cámara (x derecha, y arriba, z hacia el usuario):
+    las luces de una escena compartida no pueden seguir la pose de cada marcador como hacía
+    ilumina_modelo. Las ocho diagonales son simétricas y las luces cenital y frontal de antes
+    ya miraban casi desde la cámara con el marcador de frente, así que el aspecto apenas cambia.
+    `calidad` es una clave de ILUMINACION_PRESETS.
+    """
+    if calidad not in ILUMINACION_PRESETS:
+        raise ValueError(f"Calidad de iluminación desconocida: {calidad}")
+    direccionales, ambiente = ILUMINACION_PRESETS[calidad]
+    luces = []
+    for direccion, factor in direccionales:
+        luz = gfx.DirectionalLight(color=(1, 1, 1), intensity=intensidad * factor)
+        luz.local.position = direccion  # Apunta hacia el origen (objetivo por defecto)
+        luces.append(luz)
+    luces.append(gfx.AmbientLight(color=(1, 1, 1), intensity=ambiente))
+    return luces
+
+
+# Recorte del render: tamaño en píxeles al que se redondea el rectángulo renderizado
+# y margen relativo sobre el radio de la esfera envolvente de cada modelo
+BLOQUE_RECORTE = 64
+MARGEN_ESFERA = 1.15
+
+
+class EscalaAdaptativa:
+    """
+    Ajusta la escala de render para mantener `objetivo` FPS: mide el periodo entre renders
+    y cada `ventana` frames baja la escala un `paso` si va lento o la sube si sobra margen.
+    Los intervalos largos (nada que dibujar durante un rato) no cuentan.
+    """
+
+    def __init__(self, objetivo, minima=0.35, maxima=1.0, paso=0.125, ventana=30):
+        self.objetivo = objetivo
+        self.minima = minima
+        self.maxima = maxima
+        self.paso = paso
+        self.ventana = ventana
+        self.escala = maxima
+        self._ultimo = None
+        self._periodos = []
+
+    def actualizar(self, ahora=None):
+        ahora = time.perf_counter() if ahora is None else ahora
+        if self._ultimo is not None and ahora - self._ultimo < 0.5:
+            self._periodos.append(ahora - self._ultimo)
+        self._ultimo = ahora
+        if len(self._periodos) >= self.ventana:
+            fps = len(self._periodos) / sum(self._periodos)
+            self._periodos.clear()
+            if fps < self.objetivo * 0.95:
+                self.escala = max(self.minima, self.escala - self.paso)
+            elif fps > self.objetivo * 1.15:
+                self.escala = min(self.maxima, self.escala + self.paso)
+        return self.escala
+
+
+class CamaraCalibrada(gfx.PerspectiveCamera):
+    """
+    Cámara fija en el origen cuya proyección reproduce exactamente la matriz intrínseca
+    (focales distintas y punto principal descentrado incluidos), de modo que los modelos
+    quedan alineados con los marcadores en toda la imagen.
+    """
+
+    def __init__(self, cameraMatrix, ancho, alto, depth_range=(0.1, 1000)):
+        super().__init__(fov(cameraMatrix, ancho, alto), aspect=ancho / alto,
+                         width=ancho, height=alto, depth_range=depth_range)
+        self.cameraMatrix = np.asarray(cameraMatrix, dtype=np.float64)
+        self.ancho = ancho
+        self.alto = alto
+
+    def _update_projection_matrix(self):
+        near, far = self._get_near_and_far_plane()
+        fx, fy = self.cameraMatrix[0, 0], self.cameraMatrix[1, 1]
+        cx, cy = self.cameraMatrix[0, 2], self.cameraMatrix[1, 2]
+        # Bordes de la imagen (medio píxel más allá de los centros extremos) sobre el plano cercano
+        izquierda = -(cx + 0.5) / fx * near
+        derecha = (self.ancho - 0.5 - cx) / fx * near
+        arriba = (cy + 0.5) / fy * near
+        abajo = -(self.alto - 0.5 - cy) / fy * near
+        return la.mat_perspective(izquierda, derecha, arriba, abajo, near, far, depth_range=(0, 1))
+
+    def rectangulo_esfera(self, centro, radio):
+        """
+        Rectángulo (x0, y0, x1, y1) en píxeles que contiene la proyección de la esfera
+        (en el espacio de la cámara), o None si queda entera detrás del plano cercano.
+        Si la esfera corta el plano cercano se devuelve la imagen completa.
+        """
+        near, _ = self._get_near_and_far_plane()
+        profundidad = -centro[2]
+        if profundidad + radio <= near:
+            return None
+        if profundidad - radio <= near:
+            return 0.0, 0.0, float(self.ancho), float(self.alto)
+        # Proyección de las 8 esquinas del cubo que envuelve la esfera (cota conservadora)
+        esquinas = centro + radio * np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)])
+        fx, fy = self.cameraMatrix[0, 0], self.cameraMatrix[1, 1]
+        cx, cy = self.cameraMatrix[0, 2], self.cameraMatrix[1, 2]
+        u = cx + fx * esquinas[:, 0] / -esquinas[:, 2]
+        v = cy - fy * esquinas[:, 1] / -esquinas[:, 2]
+        # Los píxeles abarcan ±0.5 alrededor de su centro
+        return u.min() + 0.5, v.min() + 0.5, u.max() + 1.5, v.max() + 1.5
+
+
+class EntradaEscena:
+    """Modelo de un marcador dentro de la escena compartida, con su ancla y su animación."""
+
+    def __init__(self, modelo, ruta=None, fase=None):
+        self.modelo = modelo
+        self.ruta = ruta
+        self.fase = fase            # Fase que la creó (None: se conserva entre fases)
+        self.ancla = gfx.Group()    # Su matriz es la pose del marcador
+        self.ancla.add(modelo.model_obj)
+        self.memoria = estimar_memoria(modelo.model_obj)
+        # Esfera envolvente (x, y, z, radio) en el sistema del marcador, para recortar el render
+        self.esfera = getattr(modelo, "esfera", None)
+        if self.esfera is None:
+            self.esfera = modelo.model_obj.get_world_bounding_sphere()
+        # Un mixer por modelo: al descartar la entrada no quedan acciones retenidas
+        self.mixer = gfx.AnimationMixer()
+        self.accion = None
+        if modelo.indice_animacion is not None:
+            self.accion = self.mixer.clip_action(modelo.current_action)
+
+
+class GrupoInstancias:
+    """
+    Copias de un mismo asset en varios marcadores dibujadas con gfx.InstancedMesh: una malla
+    instanciada por cada malla del asset, que comparte geometría y material con el original.
+    La matriz de cada instancia es la del ancla de su marcador por la de la malla dentro del
+    modelo del líder de ese frame (el que se anima), así que todas las copias comparten la
+    animación. Las mallas se toman siempre del líder actual, no del modelo que creó el grupo:
+    los clones de un asset tienen las mismas mallas en el mismo orden de recorrido.
+    Las instancias que sobran se dejan con matriz nula (no generan fragmentos).
+    """
+
+    def __init__(self, model_obj, capacidad):
+        self.capacidad = capacidad
+        self.raiz = gfx.Group()
+        self.instanciadas = []  # Una InstancedMesh por malla del asset, en orden de recorrido
+        self._lider = None
+        self._anclas = []
+        for nodo in self.mallas(model_obj):
+            instanciada = gfx.InstancedMesh(nodo.geometry, nodo.material, capacidad)
+            instanciada.instance_buffer.data["matrix"][:] = 0
+            self.raiz.add(instanciada)
+            self.instanciadas.append(instanciada)
+
+    @staticmethod
+    def mallas(model_obj):
+        return [nodo for nodo in model_obj.iter() if isinstance(nodo, gfx.Mesh)]
+
+    @staticmethod
+    def admite(model_obj):
+        # Sin esqueletos ni morph targets, y solo mallas como objetos dibujables
+        for nodo in model_obj.iter():
+            if isinstance(nodo, gfx.SkinnedMesh):
+                return False
+            if isinstance(nodo, gfx.Mesh) and nodo._morph_target_influences is not None:
+                return False
+            if not isinstance(nodo, gfx.Mesh) and getattr(nodo, "geometry", None) is not None:
+                return False
+        return True
+
+    def asignar(self, lider, anclas):
+        """Entrada cuyo modelo se anima y anclas de los marcadores donde se dibuja este frame."""
+        self._lider = lider
+        self._anclas = anclas
+
+    def actualizar(self):
+        # Se llama después de avanzar la animación del líder
+        inversa = la.mat_inverse(self._lider.ancla.world.matrix)
+        for nodo, instanciada in zip(self.mallas(self._lider.modelo.model_obj), self.instanciadas):
+            datos = instanciada.instance_buffer.data["matrix"]
+            relativa = inversa @ nodo.world.matrix
+            for i, ancla in enumerate(self._anclas):
+                datos[i] = (ancla.local.matrix @ relativa).T
+            datos[len(self._anclas):] = 0
+            instanciada.instance_buffer.update_full()
+
+
+class EscenaCompartida:
+    """
+    Un único renderer offscreen, escena y cámara para toda la sesión.
+    Cada marcador aporta un modelo colgado de un ancla cuya matriz es la pose del marcador;
+    la cámara queda fija con los intrínsecos calibrados. Todos los modelos visibles se dibujan
+    en una sola pasada y con una sola lectura de la GPU. Con `recorte` solo se renderiza y lee
+    el rectángulo de la imagen que cubren las esferas envolventes proyectadas de los modelos.
+    Con `escala` < 1 se renderiza a menor resolución y se amplía antes de componer; con
+    `fps_objetivo` la escala se ajusta sola entre EscalaAdaptativa.minima y `escala`.
+    Con `lectura_asincrona` el render de cada frame se recoge en el siguiente (ver LecturaAsincrona).
+    Con `composicion_gpu` el frame de la cámara (fijar_fondo) se dibuja como fondo y el render
+    devuelto es el frame ya compuesto, sin mezcla en la CPU.
+    Con `instancias` un asset visible en varios marcadores se dibuja con instancias (GrupoInstancias).
+
+    Los modelos se guardan por (marker_id, ruta): cambiar el asset de un marcador solo
+    intercambia el modelo activo, y los que llevan más tiempo sin verse se descartan cuando
+    se supera `max_modelos` o el presupuesto estimado de memoria de GPU.
+    """
+
+    def __init__(self, cameraMatrix, ancho, alto, max_modelos=12, presupuesto_mb=256, iluminacion="completa",
+                 recorte=True, escala=1.0, fps_objetivo=None, lectura_asincrona=False,
+                 fps_animacion=30, tolerancia=1e-3, composicion_gpu=False, instancias=True):
+        self.ancho = ancho
+        self.alto = alto
+        self.recorte = recorte  # Renderizar solo el rectángulo que ocupan los modelos visibles
+        self.escala = escala    # Resolución del render respecto al frame (se amplía al componer)
+        self.adaptativa = EscalaAdaptativa(fps_objetivo, maxima=escala) if fps_objetivo else None
+        self._region = (ancho, alto)  # Tamaño en píxeles del frame del último rectángulo renderizado
+        self.fps_animacion = fps_animacion  # Ritmo máximo de las animaciones (None: uno por frame)
+        self.tolerancia = tolerancia        # Cambio de pose por debajo del cual se reutiliza el render (None: nunca)
+        self._tiempo_animacion = 0.0        # Tiempo acumulado desde el último avance de las animaciones
+        self._anterior = None               # ((firma, escala), resultado) del último render
+        self.instancias = instancias        # Dibujar como instancias los assets repetidos en varios marcadores
+        self._grupos = {}                   # ruta -> GrupoInstancias
+        self._compilados = []               # Objetos dibujados en calentar(): mantienen vivos sus pipelines
+        self.max_modelos = max_modelos
+        self.presupuesto = presupuesto_mb * 1024 * 1024
+        self.canvas = WgpuCanvas(size=(ancho, alto))
+        self.renderer = gfx.WgpuRenderer(self.canvas)
+        # Lectura en cadena: cada render se entrega un frame más tarde, sin esperar a la GPU
+        if lectura_asincrona and not LecturaAsincrona.disponible():
+            print("[Escena] ⚠️ Lectura asíncrona no disponible con esta versión de pygfx: se usa canvas.draw()")
+            lectura_asincrona = False
+        self.lectura = LecturaAsincrona(self.renderer, self.canvas) if lectura_asincrona else None
+        self.scene = gfx.Scene()
+        self.scene.background = None  # Fondo transparente
+        self.camera = CamaraCalibrada(cameraMatrix, ancho, alto)
+        self.clock = gfx.Clock()
+        self.entradas = OrderedDict()  # (marker_id, ruta) -> EntradaEscena, de menos a más recientemente visible
+        self.activas = {}              # marker_id -> clave de la entrada que se dibuja en ese marcador
+        self.iluminacion = iluminacion
+        for luz in crear_iluminacion(iluminacion):
+            self.scene.add(luz)
+        # Composición en la GPU: el frame de la cámara es el fondo de la escena y el render
+        # sale ya compuesto, a resolución completa (sin recorte ni escala) y opaco
+        self.composicion_gpu = composicion_gpu
+        self._fondo = None
+        if composicion_gpu:
+            self.recorte = False
+            self.escala = 1.0
+            self.adaptativa = None
+            self.tolerancia = None  # El fondo cambia en cada frame
+            self._fondo_datos = np.full((alto, ancho, 4), 255, dtype=np.uint8)
+            self._fondo_textura = gfx.Texture(self._fondo_datos, dim=2, format="bgra8unorm")
+            self.scene.add(gfx.Background(None, gfx.BackgroundImageMaterial(map=self._fondo_textura)))
+
+    def __contains__(self, marker_id):
+        return marker_id in self.activas
+
+    def __len__(self):
+        return len(self.entradas)
+
+    @property
+    def memoria(self):
+        # Los clones de un mismo asset comparten buffers: cada ruta se cuenta una vez
+        por_ruta = {}
+        for (marker_id, ruta), entrada in self.entradas.items():
+            por_ruta[ruta or (marker_id, ruta)] = entrada.memoria
+        return sum(por_ruta.values())
+
+    # ----------------------------------------------------------
+    # ALTA, INTERCAMBIO Y BAJA DE MODELOS
+    # ----------------------------------------------------------
+    def activar(self, marker_id, ruta=None):
+        """
+        Deja activo en el marcador el modelo de `ruta` si ya está en la escena.
+        Sin ruta se mantiene el que hubiera. Devuelve False si hay que crearlo.
+        """
+        if not ruta:
+            return marker_id in self.activas
+        clave = (marker_id, ruta)
+        if self.activas.get(marker_id) == clave:
+            return True
+        if clave not in self.entradas:
+            return False
+        self._desactivar(marker_id)
+        self._activar(clave)
+        return True
+
+    def agregar(self, marker_id, modelo, ruta=None, fase=None):
+        """Añade el modelo de un marcador y lo deja activo en lugar del anterior."""
+        clave = (marker_id, ruta)
+        self._liberar(clave)
+        self._desactivar(marker_id)
+        self.entradas[clave] = EntradaEscena(modelo, ruta, fase)
+        self._activar(clave)
+        self._ajustar_limites(clave)
+
+    def quitar(self, marker_id):
+        """Descarta todos los modelos del marcador."""
+        for clave in [c for c in self.entradas if c[0] == marker_id]:
+            self._liberar(clave)
+
+    def liberar_fase(self, fase):
+        """Descarta los modelos creados durante `fase`."""
+        for clave in [c for c, e in self.entradas.items() if e.fase == fase]:
+            self._liberar(clave)
+
+    def limpiar(self):
+        for clave in list(self.entradas):
+            self._liberar(clave)
+
+    def _activar(self, clave):
+        entrada = self.entradas[clave]
+        entrada.ancla.visible = False
+        self.scene.add(entrada.ancla)
+        if entrada.accion is not None:
+            entrada.accion.play()
+        self.activas[clave[0]] = clave
+
+    def _desactivar(self, marker_id):
+        # El modelo sale de la escena pero sigue en caché para volver a activarlo
+        clave = self.activas.pop(marker_id, None)
+        if clave is None:
+            return
+        entrada = self.entradas[clave]
+        if entrada.accion is not None:
+            entrada.accion.stop()
+        self.scene.remove(entrada.ancla)
+
+    def _liberar(self, clave):
+        if clave not in self.entradas:
+            return
+        if self.activas.get(clave[0]) == clave:
+            self._desactivar(clave[0])
+        del self.entradas[clave]
+        grupo = self._grupos.get(clave[1])
+        if grupo is not None and not any(c[1] == clave[1] for c in self.entradas):
+            self.scene.remove(grupo.raiz)
+            del self._grupos[clave[1]]
+
+    def _ajustar_limites(self, proteger):
+        # Se descartan primero los modelos que llevan más tiempo sin verse
+        while len(self.entradas) > self.max_modelos or self.memoria > self.presupuesto:
+            clave = next((c for c in self.entradas if c != proteger), None)
+            if clave is None:
+                break
+            self._liberar(clave)
+
+    # ----------------------------------------------------------
+    # RENDER
+    # ----------------------------------------------------------
+    def calentar(self, modelos):
+        """
+        Dibuja una vez, sin entregar el render, los modelos [(ruta, modelo), ...] para que se
+        compilen sus shaders y pipelines (también los de instancias y fondo) antes de
+        que aparezcan en un marcador. Las cachés de pygfx solo guardan los pipelines mientras
+        viva algún objeto que los use: los modelos dibujados se conservan fuera de la escena
+        (son pocos, uno por combinación de material).
+        Devuelve cuántos modelos se han podido dibujar.
+        """
+        dibujados = 0
+        if self.canvas.get_physical_size() != (self.ancho, self.alto):
+            self.canvas.set_logical_size(self.ancho, self.alto)
+        self.camera.set_view_offset(self.ancho, self.alto, 0, 0, self.ancho, self.alto)
+        for ruta, modelo in modelos:
+            entrada = EntradaEscena(modelo, ruta)
+            # Delante de la cámara, a tres radios de distancia, como visto desde arriba
+            *centro, radio = entrada.esfera
+            rvec = np.array([2.0, 0.0, 0.0])
+            tvec = np.array([0.0, 0.0, 3.0 * radio]) - cv2.Rodrigues(rvec)[0] @ np.array(centro)
+            entrada.ancla.local.matrix = pose_opencv_a_pygfx(rvec, tvec)
+            objetos = [entrada.ancla]
+            grupo = None
+            if self.instancias and GrupoInstancias.admite(modelo.model_obj):
+                grupo = GrupoInstancias(modelo.model_obj, 1)
+                grupo.asignar(entrada, [entrada.ancla])
+                objetos.append(grupo.raiz)
+            for objeto in objetos:
+                self.scene.add(objeto)
+            try:
+                if grupo is not None:
+                    grupo.actualizar()
+                self.renderer.render(self.scene, self.camera)
+                self.canvas.draw()  # Espera a que la GPU termine
+                self._compilados.extend(objetos)
+                dibujados += 1
+            except Exception as e:
+                # Un asset que no se puede dibujar no debe impedir el arranque
+                print(f"[Escena] ⚠️ No se pudo precompilar {ruta}: {e}")
+            for objeto in objetos:
+                self.scene.remove(objeto)
+        return dibujados
+
+    def capas(self, poses, visibles):
+        """Capas (RGBA, (x, y)) para componer sobre el frame: el render de todos los modelos, o ninguna."""
+        capa = self.render(poses, visibles)
+        return [capa] if capa is not None else []
+
+    def render(self, poses, visibles):
+        """
+        Coloca cada ancla de `visibles` en la pose de su marcador y dibuja todo en una pasada.
+        Devuelve (render RGBA, (x, y)) con la esquina del rectángulo renderizado dentro del frame,
+        o None si no hay nada que dibujar. Los modelos que quedan fuera de la imagen no se dibujan.
+        Con lectura asíncrona el render devuelto es el del frame anterior (retraso en self.lectura.retraso).
+        Si los modelos visibles y sus poses no han cambiado más de `tolerancia` y ninguna animación
+        avanza en este frame, se devuelve el render anterior sin volver a dibujar.
+        """
+        # Las animaciones avanzan como mucho a fps_animacion, sea cual sea el ritmo de la cámara
+        self._tiempo_animacion += self.clock.get_delta()
+        animar = not self.fps_animacion or self._tiempo_animacion >= 1.0 / self.fps_animacion
+        animado = False
+        firma = []
+        dibujadas = []
+        rectangulo = None
+        for marker_id, clave in self.activas.items():
+            entrada = self.entradas[clave]
+            visible = marker_id in visibles and marker_id in poses
+            if visible:
+                rvec, tvec = poses[marker_id]
+                entrada.ancla.local.matrix = pose_opencv_a_pygfx(rvec, tvec)
+                rect = self._rectangulo(entrada) if self.recorte else (0, 0, self.ancho, self.alto)
+                visible = rect is not None
+            entrada.ancla.visible = visible
+            if visible:
+                dibujadas.append(entrada)
+                firma.append((clave, entrada.ancla.local.matrix))
+                self.entradas.move_to_end(clave)
+                rectangulo = rect if rectangulo is None else (
+                    min(rectangulo[0], rect[0]), min(rectangulo[1], rect[1]),
+                    max(rectangulo[2], rect[2]), max(rectangulo[3], rect[3]))
+        # Los modelos repetidos se dibujan como instancias y comparten la animación del primero
+        for entrada in self._instanciar(dibujadas) if self.instancias else dibujadas:
+            if entrada.accion is not None:
+                animado = True
+                if animar:
+                    entrada.mixer.update(self._tiempo_animacion)
+        for grupo in self._grupos.values():
+            if grupo.raiz.visible:
+                grupo.actualizar()
+        if animar:
+            self._tiempo_animacion = 0.0
+        if rectangulo is None:
+            if self.lectura is not None:
+                self.lectura.descartar()
+            self._anterior = None
+            return None
+        if self.adaptativa is not None:
+            self.escala = self.adaptativa.actualizar()
+
+        if not (animado and animar) and self._sin_cambios(firma):
+            if self.lectura is not None:
+                # El último render enviado ya es el de esta pose: se recoge en lugar del anterior
+                recogido = self.lectura.recoger(esperar=True)
+                if recogido is not None:
+                    imagen, (x, y, w, h, tam) = recogido
+                    self._anterior = (self._anterior[0], self._entregar(imagen, x, y, w, h, tam))
+            return self._anterior[1]
+
+        x, y, w, h = self._ajustar_rectangulo(rectangulo)
+        # El canvas tiene la resolución escalada; la cámara sigue trabajando en píxeles del frame
+        tam = (max(1, round(w * self.escala)), max(1, round(h * self.escala)))
+        if self.canvas.get_physical_size() != tam:
+            self.canvas.set_logical_size(*tam)
+        self.camera.set_view_offset(self.ancho, self.alto, x, y, w, h)
+        if self.composicion_gpu:
+            self._subir_fondo()
+        if self.lectura is not None:
+            self.renderer.render(self.scene, self.camera, flush=False)
+            self.lectura.enviar((x, y, w, h, tam))
+            recogido = self.lectura.recoger()
+            if recogido is None:
+                if self._anterior is None:
+                    return None
+                # Cadena recién vaciada: se repite la última imagen y este render se recoge después
+                self._anterior = ((firma, self.escala), self._anterior[1])
+                return self._anterior[1]
+            imagen, (x, y, w, h, tam) = recogido
+        else:
+            self.renderer.render(self.scene, self.camera)
+            imagen = np.asarray(self.canvas.draw())
+        self._anterior = ((firma, self.escala), self._entregar(imagen, x, y, w, h, tam))
+        return self._anterior[1]
+
+    def fijar_fondo(self, imagen_bgr):
+        """Frame BGR de la cámara sobre el que se compondrá el siguiente render (composicion_gpu)."""
+        self._fondo = imagen_bgr
+
+    def _subir_fondo(self):
+        # Una copia por frame: BGR → BGRA (alfa fijo) invirtiendo las filas, porque el fondo
+        # de pygfx coloca la fila 0 de la textura abajo
+        if self._fondo is not None:
+            self._fondo_datos[::-1, :, :3] = self._fondo
+            self._fondo_textura.update_full()
+            self._fondo = None
+
+    def _entregar(self, imagen, x, y, w, h, tam):
+        # Render a la resolución del frame, con su posición
+        if tam != (w, h):
+            imagen = cv2.resize(imagen, (w, h), interpolation=cv2.INTER_LINEAR)
+        return imagen, (x, y)
+
+    def _sin_cambios(self, firma):
+        # Mismos modelos visibles, en poses dentro de la tolerancia y a la misma escala de render
+        if self._anterior is None or self.tolerancia is None:
+            return False
+        firma_anterior, escala = self._anterior[0]
+        if escala != self.escala or len(firma) != len(firma_anterior):
+            return False
+        return all(clave == clave_anterior and np.allclose(matriz, matriz_anterior, rtol=0, atol=self.tolerancia)
+                   for (clave, matriz), (clave_anterior, matriz_anterior) in zip(firma, firma_anterior))
+
+    def _instanciar(self, dibujadas):
+        """
+        Agrupa por asset los modelos visibles: los que se repiten en varios marcadores se ocultan
+        y se dibujan con el GrupoInstancias del asset (una llamada de dibujo por malla).
+        Devuelve las entradas cuya animación hay que avanzar.
+        """
+        por_ruta = {}
+        for entrada in dibujadas:
+            por_ruta.setdefault(entrada.ruta, []).append(entrada)
+        animadas = []
+        for grupo in self._grupos.values():
+            grupo.raiz.visible = False
+        for ruta, entradas in por_ruta.items():
+            if not ruta or len(entradas) < 2 or not GrupoInstancias.admite(entradas[0].modelo.model_obj):
+                animadas.extend(entradas)
+                continue
+            grupo = self._grupos.get(ruta)
+            if grupo is None or grupo.capacidad < len(entradas):
+                if grupo is not None:
+                    self.scene.remove(grupo.raiz)
+                grupo = self._grupos[ruta] = GrupoInstancias(entradas[0].modelo.model_obj, max(4, len(entradas)))
+                self.scene.add(grupo.raiz)
+            for entrada in entradas:
+                entrada.ancla.visible = False
+            grupo.asignar(entradas[0], [e.ancla for e in entradas])
+            grupo.raiz.visible = True
+            animadas.append(entradas[0])
+        return animadas
+
+    def _rectangulo(self, entrada):
+        # Rectángulo de la imagen que cubre la esfera envolvente del modelo (None si no se ve)
+        *centro, radio = entrada.esfera
+        centro = la.vec_transform(centro, entrada.ancla.local.matrix)
+        # Margen para las animaciones que se salen de la pose de reposo
+        rect = self.camera.rectangulo_esfera(centro, radio * MARGEN_ESFERA)
+        if rect is None or rect[2] <= 0 or rect[3] <= 0 or rect[0] >= self.ancho or rect[1] >= self.alto:
+            return None
+        return rect
+
+    def _ajustar_rectangulo(self, rectangulo):
+        """
+        Rectángulo entero (x, y, w, h) dentro del frame que contiene `rectangulo`.
+        El tamaño se redondea a múltiplos de BLOQUE_RECORTE y se mantiene el del frame anterior
+        mientras quepa y no sobre demasiado: cada cambio de tamaño del canvas reserva de nuevo
+        las texturas de render en la GPU.
+        """
+        x0, y0 = max(0, int(np.floor(rectangulo[0]))), max(0, int(np.floor(rectangulo[1])))
+        x1 = min(self.ancho, int(np.ceil(rectangulo[2])))
+        y1 = min(self.alto, int(np.ceil(rectangulo[3])))
+        w = min(self.ancho, -(-(x1 - x0) // BLOQUE_RECORTE) * BLOQUE_RECORTE)
+        h = min(self.alto, -(-(y1 - y0) // BLOQUE_RECORTE) * BLOQUE_RECORTE)
+        actual_w, actual_h = self._region
+        if w <= actual_w and h <= actual_h and actual_w * actual_h <= 2 * w * h:
+            w, h = actual_w, actual_h
+        self._region = (w, h)
+        # Centrado sobre los modelos sin salirse del frame
+        x = min(max(0, x0 - (w - (x1 - x0)) // 2), self.ancho - w)
+        y = min(max(0, y0 - (h - (y1 - y0)) // 2), self.alto - h)
+        return x, y, w, h
@@ -0,0 +1,99 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class EscenaImpostores:
+    """
+    Sustituto de EscenaCompartida sin render 3D, para equipos sin GPU utilizable.
+    Cada modelo se dibuja con el sprite pre-renderizado (models.impostores) cuya vista está
+    más cerca de la dirección desde la que la cámara ve el marcador, proyectado sobre el frame
+    con la homografía del plano del sprite. Las animaciones avanzan con el reloj real.
+    """
+
+    composicion_gpu = False
+
+    def __init__(self, cameraMatrix, ancho, alto, atlas):
+        self.cameraMatrix = np.asarray(cameraMatrix, dtype=np.float64)
+        self.ancho = ancho
+        self.alto = alto
+        self.atlas = atlas          # AtlasImpostores
+        self.activas = {}           # marker_id -> ruta del asset que se dibuja en ese marcador
+        self.inicio = time.perf_counter()
+        self._avisados = set()
+
+    def __contains__(self, marker_id):
+        return marker_id in self.activas
+
+    def __len__(self):
+        return len(self.activas)
+
+    # ----------------------------------------------------------
+    # MISMA INTERFAZ QUE EscenaCompartida
+    # ----------------------------------------------------------
+    def activar(self, marker_id, ruta=None):
+        # Los sprites no se crean por marcador: cualquier asset queda activo al momento
+        if not ruta:
+            return marker_id in self.activas
+        if ruta not in self.atlas and ruta not in self._avisados:
+            self._avisados.add(ruta)
+            print(f"[Impostores] ⚠️ Sin atlas para {ruta} (python -m models.impostores)")
+        self.activas[marker_id] = ruta
+        return True
+
+    def agregar(self, marker_id, modelo, ruta=None, fase=None):
+        self.activas[marker_id] = ruta
+
+    def quitar(self, marker_id):
+        self.activas.pop(marker_id, None)
+
+    def liberar_fase(self, fase):
+        # Los atlas se comparten entre fases y no hay nada por marcador que liberar
+        pass
+
+    def limpiar(self):
+        self.activas.clear()
+
+    def capas(self, poses, visibles):
+        """Una capa (RGBA, (x, y)) por modelo visible, de la más lejana a la más cercana."""
+        tiempo = time.perf_counter() - self.inicio
+        marcadores = [m for m in self.activas if m in visibles and m in poses and self.activas[m] in self.atlas]
+        marcadores.sort(key=lambda m: -float(np.ravel(poses[m][1])[2]))
+        capas = []
+        for marker_id in marcadores:
+            capa = self._sprite(self.activas[marker_id], *poses[marker_id], tiempo)
+            if capa is not None:
+                capas.append(capa)
+        return capas
+
+    def _sprite(self, ruta, rvec, tvec, tiempo):
+        atlas, entrada = self.atlas.cargar(ruta)
+        R = cv2.Rodrigues(np.asarray(rvec, dtype=np.float64))[0]
+        tvec = np.ravel(tvec).astype(np.float64)
+
+        # Vista más cercana a la dirección modelo → cámara (en el sistema del marcador)
+        direccion = -R.T @ tvec - entrada["esfera"][:3]
+        vista = int(np.argmax(entrada["direcciones"] @ (direccion / np.linalg.norm(direccion))))
+        frame = int(tiempo / entrada["duracion"] * entrada["frames"]) % entrada["frames"] if entrada["duracion"] else 0
+        sprite = entrada["sprites"][frame * len(entrada["direcciones"]) + vista]
+
+        # Esquinas del plano del sprite en la imagen; se descarta si alguna queda detrás de la cámara
+        plano = sprite["plano"]
+        if np.any((plano @ R.T + tvec)[:, 2] <= 0):
+            return None
+        destino = cv2.projectPoints(plano, rvec, tvec, self.cameraMatrix, None)[0].reshape(4, 2)
+        x0, y0 = np.floor(destino.min(axis=0)).astype(int)
+        x1, y1 = np.ceil(destino.max(axis=0)).astype(int) + 1
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.ancho), min(y1, self.alto)
+        if x1 <= x0 or y1 <= y0:
+            return None
+
+        tam = entrada["tam"]
+        origen = np.float32([[-0.5, -0.5], [tam - 0.5, -0.5], [tam - 0.5, tam - 0.5], [-0.5, tam - 0.5]])
+        H = cv2.getPerspectiveTransform(origen, np.float32(destino - (x0, y0)))
+        recorte = atlas[sprite["y"]:sprite["y"] + tam, sprite["x"]:sprite["x"] + tam]
+        capa = cv2.warpPerspective(recorte, H, (x1 - x0, y1 - y0), flags=cv2.INTER_LINEAR,
+                                   borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        return capa, (x0, y0)
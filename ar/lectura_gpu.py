@@ -0,0 +1,96 @@
+import time
+from collections import deque
+
+import numpy as np
+import pygfx as gfx
+import wgpu
+
+try:
+    # Interno de pygfx (no hay API pública para el GPUTexture de un gfx.Texture): si cambia
+    # en otra versión no hay lectura asíncrona, pero el resto de la escena sigue funcionando
+    from pygfx.renderers.wgpu.engine.update import ensure_wgpu_object
+except ImportError:
+    ensure_wgpu_object = None
+
+
+class LecturaAsincrona:
+    """
+    Lectura de renders de la GPU en cadena: el render de un frame se copia a un buffer
+    mapeable y se recoge en el frame siguiente, cuando la GPU ya lo ha terminado, en lugar
+    de esperar a que acabe (como hace canvas.draw()).
+    Los buffers se reutilizan por turnos y la imagen entregada es una vista sobre la memoria
+    mapeada (sin copia), válida hasta la siguiente llamada a enviar() que reutilice su buffer.
+    A cambio, cada imagen llega con `profundidad` - 1 frames de retraso; `retraso` guarda los
+    segundos transcurridos entre el envío de la última imagen entregada y su entrega.
+    """
+
+    def __init__(self, renderer, canvas, profundidad=2):
+        self.renderer = renderer
+        self.canvas = canvas
+        self.device = renderer.device
+        self.profundidad = profundidad
+        # El destino del volcado tiene el formato del canvas: los bytes son los de canvas.draw()
+        self.formato = canvas.get_context("wgpu").get_configuration()["format"]
+        self.retraso = 0.0
+        self._textura = None
+        self._buffers = [None] * (profundidad + 1)
+        self._siguiente = 0
+        self._pendientes = deque()  # (buffer, ancho, alto, bytes por fila, datos, instante de envío)
+
+    @staticmethod
+    def disponible():
+        return ensure_wgpu_object is not None
+
+    def enviar(self, datos=None):
+        """
+        Vuelca el último render(flush=False) del renderer y encola su copia a un buffer
+        sin esperar a la GPU. `datos` se devuelve junto con la imagen al recogerla.
+        """
+        # Tamaño del canvas (el renderer trabaja internamente a más resolución y la reduce al volcar)
+        ancho, alto = self.canvas.get_physical_size()
+        if self._textura is None or tuple(self._textura.size[:2]) != (ancho, alto):
+            # El formato ya es sRGB: "physical" evita que pygfx vuelva a convertir el color
+            self._textura = gfx.Texture(dim=2, size=(ancho, alto, 1), format=self.formato, colorspace="physical",
+                                        usage=wgpu.TextureUsage.RENDER_ATTACHMENT | wgpu.TextureUsage.COPY_SRC)
+        self.renderer.flush(self._textura)
+
+        # Las filas de una copia textura → buffer van alineadas a 256 bytes
+        por_fila = -(-ancho * 4 // 256) * 256
+        i = self._siguiente
+        self._siguiente = (i + 1) % len(self._buffers)
+        buffer = self._buffers[i]
+        if buffer is not None and buffer.map_state == "mapped":
+            buffer.unmap()  # Invalida la vista entregada hace `profundidad` frames
+        if buffer is None or buffer.size < por_fila * alto:
+            buffer = self._buffers[i] = self.device.create_buffer(
+                size=por_fila * alto, usage=wgpu.BufferUsage.COPY_DST | wgpu.BufferUsage.MAP_READ)
+
+        encoder = self.device.create_command_encoder()
+        encoder.copy_texture_to_buffer(
+            {"texture": ensure_wgpu_object(self._textura), "mip_level": 0, "origin": (0, 0, 0)},
+            {"buffer": buffer, "offset": 0, "bytes_per_row": por_fila, "rows_per_image": alto},
+            (ancho, alto, 1))
+        self.device.queue.submit([encoder.finish()])
+        self._pendientes.append((buffer, ancho, alto, por_fila, datos, time.perf_counter()))
+
+    def recoger(self, esperar=False):
+        """
+        Devuelve (imagen RGBA, datos) del render más antiguo en cola una vez hay `profundidad`
+        renders enviados, o None mientras se llena la cadena. Con `esperar` se recoge el
+        último render enviado aunque haya que esperar a la GPU.
+        """
+        if not self._pendientes or (not esperar and len(self._pendientes) < self.profundidad):
+            return None
+        while esperar and len(self._pendientes) > 1:
+            self._pendientes.popleft()
+        buffer, ancho, alto, por_fila, datos, enviado = self._pendientes.popleft()
+        # Su copia se envió hace al menos un frame: normalmente el mapeo ya no espera a la GPU
+        buffer.map_sync(wgpu.MapMode.READ, 0, por_fila * alto)
+        memoria = buffer.read_mapped(0, por_fila * alto, copy=False)
+        imagen = np.frombuffer(memoria, dtype=np.uint8).reshape(alto, por_fila // 4, 4)[:, :ancho]
+        self.retraso = time.perf_counter() - enviado
+        return imagen, datos
+
+    def descartar(self):
+        """Olvida los renders en cola (p. ej. cuando deja de haber algo que dibujar)."""
+        self._pendientes.clear()
@@ -0,0 +1,57 @@
+# benchmark_composicion.py
+# Compara cuia.alphaBlending con utils.conversiones.CompositorAlpha.
+# Uso (desde la raíz del proyecto): python -m benchmarks.benchmark_composicion
+import time
+import numpy as np
+import cv2
+
+from modules.cuia import alphaBlending
+from utils.conversiones import CompositorAlpha
+
+
+def capa_modelo(ancho, alto, cx, cy, radio):
+    """Render sintético: un modelo opaco con borde suavizado sobre fondo transparente."""
+    capa = np.zeros((alto, ancho, 4), dtype=np.uint8)
+    cv2.circle(capa, (cx, cy), radio, (40, 180, 220, 255), -1, lineType=cv2.LINE_AA)
+    return capa
+
+
+def medir(funcion, repeticiones):
+    funcion()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000.0
+
+
+def main(ancho=1920, alto=1080, modelos=(1, 3, 6), repeticiones=10):
+    rng = np.random.default_rng(0)
+    fondo = rng.integers(0, 256, (alto, ancho, 3), dtype=np.uint8)
+    compositor = CompositorAlpha()
+
+    print(f"Composición de capas de {ancho}x{alto} (ms por frame)")
+    print(f"{'modelos':>8} {'alphaBlending':>14} {'CompositorAlpha':>16} {'mejora':>8}")
+    for n in modelos:
+        capas = [capa_modelo(ancho, alto, 200 + i * 280, alto // 2, 110) for i in range(n)]
+
+        def antiguo():
+            frame = fondo.copy()
+            for capa in capas:
+                frame = alphaBlending(capa, frame)
+            return frame
+
+        def nuevo():
+            frame = fondo.copy()
+            for capa in capas:
+                compositor.componer(frame, capa)
+            return frame
+
+        diferencia = np.abs(antiguo()[:, :, :3].astype(int) - nuevo().astype(int)).max()
+        t_antiguo = medir(antiguo, repeticiones)
+        t_nuevo = medir(nuevo, repeticiones)
+        print(f"{n:>8} {t_antiguo:>14.1f} {t_nuevo:>16.1f} {t_antiguo / t_nuevo:>7.1f}x"
+              f"   (diferencia máx. {diferencia})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# benchmark_lectura.py
+# Compara la lectura síncrona del render (canvas.draw) con la lectura en cadena (LecturaAsincrona)
+# de la escena compartida: tiempo por frame y retraso con el que llega cada imagen.
+# Uso (desde la raíz del proyecto): python -m benchmarks.benchmark_lectura
+import time
+import numpy as np
+
+from ar.escena import EscenaCompartida
+from models.modelos import crear_modelo
+
+
+def main(ancho=1280, alto=720, ruta="media/frutas/Apple.glb", frames=30):
+    cameraMatrix = np.array([[900.0, 0, ancho / 2], [0, 900.0, alto / 2], [0, 0, 1]])
+    pose = {1: (np.array([2.0, 0.0, 0.0]), np.array([0.0, 0.0, 3.0]))}
+    print(f"Lectura del render de {ancho}x{alto} (ms por frame)")
+    for asincrona in (False, True):
+        # Sin tolerancia: con la pose fija se reutilizaría el render anterior en lugar de medir la lectura
+        escena = EscenaCompartida(cameraMatrix, ancho, alto, recorte=False, lectura_asincrona=asincrona,
+                                  tolerancia=None)
+        escena.agregar(1, crear_modelo(ruta), ruta)
+        for _ in range(3):  # Compilación de shaders y llenado de la cadena
+            escena.render(pose, {1})
+        inicio = time.perf_counter()
+        retrasos = []
+        for _ in range(frames):
+            escena.render(pose, {1})
+            if asincrona:
+                retrasos.append(escena.lectura.retraso)
+        total = (time.perf_counter() - inicio) / frames * 1000.0
+        if asincrona:
+            print(f"  en cadena:  {total:7.2f}  (retraso medio {np.mean(retrasos) * 1000:.1f} ms, 1 frame)")
+        else:
+            print(f"  síncrona:   {total:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
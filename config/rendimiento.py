@@ -0,0 +1,52 @@
+# Parámetros de rendimiento del pipeline de realidad aumentada
+
+# --- Captura ---
+CAPTURA_EN_HILO = True   # Lee la cámara en un hilo aparte y entrega siempre el frame más reciente
+CAPTURA_BUFFER = 2       # Tamaño del buffer circular de frames capturados
+
+# --- Cámara ---
+CAMARA_CACHE = "data/camaras.json"  # Backend, resolución y FPS negociados por dispositivo
+CAMARA_TIMEOUT_SONDEO = 5.0         # Segundos máximos que puede tardar cada backend en abrir la cámara y dar un frame
+
+# --- Detección de marcadores ---
+# "completo": todo el frame | "roi": seguimiento alrededor de los marcadores previos
+# "multiescala": detección sobre el frame reducido y refinado subpíxel | "roi_multiescala": ambos
+MODO_DETECCION = "roi"
+DETECCION_REESCANEO = 15    # En modo "roi", frames entre búsquedas en todo el frame
+DETECCION_MARGEN = 0.5      # En modo "roi", margen de búsqueda relativo al tamaño del marcador
+DETECCION_ESCALA = 0.5      # En modo "multiescala", factor de reducción del frame para detectar
+DETECCION_INTERVALO = 1     # Detectar 1 de cada N frames; en el resto se predice la pose (requiere POSE_FILTRO)
+OCULTAR_MARCADORES = None   # None: se ven los marcadores | "media": color del entorno | "inpaint": reconstrucción (lenta)
+
+# --- Seguimiento de poses (filtro One-Euro) ---
+POSE_FILTRO = True          # Suaviza la pose de cada marcador y predice los frames sin detección
+POSE_MIN_CUTOFF = 1.0       # Hz: menor = más suavizado con el marcador quieto
+POSE_BETA = 1.0             # Mayor = menos retraso cuando el marcador se mueve deprisa
+POSE_D_CUTOFF = 1.0         # Hz: suavizado de la velocidad estimada
+POSE_MAX_PREDICCION = 0.25  # Segundos que se mantiene un marcador perdido antes de ocultarlo
+
+# --- Assets 3D ---
+ASSETS_PRESUPUESTO_MB = 512  # Memoria estimada (geometría + texturas) de GLB parseados que se mantienen en caché
+ASSETS_PRECARGA = True       # Carga los assets en un hilo de fondo (al elegir mundo y con los castillos a la vista)
+ASSETS_COMPILADOS = "data/assets"  # Caché de python -m models.assets_compilados (None: usar siempre los GLB)
+ASSETS_LOD = 1               # Nivel de detalle de la caché compilada: 0 = malla original, 1 y 2 = simplificadas
+ESCENA_MAX_MODELOS = 12      # Modelos (marcador, asset) que se mantienen cargados en la escena compartida
+ESCENA_PRESUPUESTO_MB = 256  # Memoria de GPU estimada de esos modelos; se descartan los menos vistos
+
+# --- Render 3D ---
+# "3d": render con pygfx | "impostores": sprites pre-renderizados (python -m models.impostores)
+# proyectados con una homografía, para equipos sin GPU utilizable
+RENDER_MODO = "3d"
+IMPOSTORES_DIRECTORIO = "data/impostores"
+# "completa": 10 luces direccionales + ambiente | "ligera": principal + relleno + ambiente
+# "minima": una luz + ambiente (GPUs integradas o Vulkan por software)
+ILUMINACION = "completa"
+RENDER_RECORTE = True       # Renderiza y lee solo el rectángulo de la imagen que ocupan los modelos
+RENDER_ESCALA = 1.0         # Resolución del render 3D respecto a la cámara (0.5: mitad, ampliado al componer)
+RENDER_FPS_OBJETIVO = None  # FPS a mantener bajando la escala de render (hasta 0.35); None: escala fija
+RENDER_LECTURA_ASINCRONA = False  # Recoge cada render en el frame siguiente sin esperar a la GPU (+1 frame de retraso)
+RENDER_TOLERANCIA_POSE = 1e-3     # Cambio máx. de pose (m / rad aprox.) con el que se reutiliza el render anterior; None: siempre dibujar
+ANIMACION_FPS = 30                # Ritmo máximo de avance de las animaciones de los modelos, independiente de la cámara
+RENDER_COMPOSICION_GPU = False    # El frame de la cámara se sube como fondo y se lee ya compuesto (sin recorte ni escala)
+RENDER_INSTANCIAS = True          # Un asset visible en varios marcadores se dibuja con instancias (sin esqueleto ni morphs)
+RENDER_CALENTAR = True            # Precompila los shaders de cada material de media/ (un modelo por frame al arrancar)
@@ -7,18 +7,32 @@ import speech_recognition as sr
 
 # --- Configuración y AR ---
 from config.calibracion import cargar_calibracion
-from ar.deteccion import crear_detector
-from modules.cuia import bestBackend, myVideo
+from config.rendimiento import (
+    CAPTURA_EN_HILO, CAPTURA_BUFFER, CAMARA_CACHE, CAMARA_TIMEOUT_SONDEO,
+    MODO_DETECCION, DETECCION_REESCANEO, DETECCION_MARGEN, DETECCION_ESCALA,
+    DETECCION_INTERVALO, OCULTAR_MARCADORES,
+    POSE_FILTRO, POSE_MIN_CUTOFF, POSE_BETA, POSE_D_CUTOFF, POSE_MAX_PREDICCION,
+    ESCENA_MAX_MODELOS, ESCENA_PRESUPUESTO_MB, ILUMINACION, RENDER_RECORTE,
+    RENDER_ESCALA, RENDER_FPS_OBJETIVO, RENDER_LECTURA_ASINCRONA,
+    RENDER_TOLERANCIA_POSE, ANIMACION_FPS, RENDER_COMPOSICION_GPU, RENDER_INSTANCIAS,
+    RENDER_MODO, IMPOSTORES_DIRECTORIO, RENDER_CALENTAR,
+)
+from ar.deteccion import crear_detector, SeguidorPoses
+from ar.escena import EscenaCompartida
+from ar.impostores import EscenaImpostores
+from modules.cuia import infoCamara, myVideo
 
 # --- Núcleo del juego ---
 from modules.game_state import GameState
 from modules.tts_manager import TTSManager
 from modules.voice_recognition import inicializar_microfono, reconocimiento_voz
-from modules.ui_renderer import realidad_mixta, render_ui
+from modules.frame_pipeline import FramePipeline
 from modules.gestorJuegos import GestorJuegosAR
 
 # --- Modelos disponibles ---
-from models.modelos import rutas_frutas, rutas_letras, rutas_animales, rutas_verduras, rutas_numeros
+from models.modelos import rutas_frutas, rutas_letras, rutas_animales, rutas_verduras, rutas_numeros, precarga
+from models.impostores import AtlasImpostores
+from models.calentamiento import Calentamiento
 
 
 def main():
@@ -26,7 +40,6 @@ def main():
 
     # --- Estado global ---
     state = GameState()
-    escenas = {}
     voice_thread_active = [True]
 
     # --- Inicializar TTS ---
@@ -50,17 +63,34 @@ def main():
 
     # --- Inicializar cámara y AR ---
     cam = 0
-    bk = bestBackend(cam)
-    webcam = cv2.VideoCapture(cam, bk)
-    ancho = int(webcam.get(cv2.CAP_PROP_FRAME_WIDTH))
-    alto = int(webcam.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    webcam.release()
+    info_camara = infoCamara(cam, CAMARA_CACHE, CAMARA_TIMEOUT_SONDEO)
+    ar = myVideo(cam, info_camara["backend"], hilo=CAPTURA_EN_HILO, buffer=CAPTURA_BUFFER)
+    if not ar.isOpened():
+        # El backend guardado ya no sirve (cambio de cámara o de drivers): volvemos a sondear
+        ar.release()
+        info_camara = infoCamara(cam, CAMARA_CACHE, CAMARA_TIMEOUT_SONDEO, refrescar=True)
+        ar = myVideo(cam, info_camara["backend"], hilo=CAPTURA_EN_HILO, buffer=CAPTURA_BUFFER)
+    ancho = info_camara["ancho"] or int(ar.get(cv2.CAP_PROP_FRAME_WIDTH))
+    alto = info_camara["alto"] or int(ar.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    print(f"📷 Cámara {cam}: backend {info_camara['nombre']} · {ancho}x{alto} @ {info_camara['fps']:.0f} FPS")
 
     cameraMatrix, distCoeffs = cargar_calibracion(ancho, alto)
-    detector = crear_detector()
-
-    ar = myVideo(cam, bk)
-    ar.process = lambda frame: realidad_mixta(frame.copy(), detector, cameraMatrix, distCoeffs, state, escenas)
+    detector = crear_detector(MODO_DETECCION, DETECCION_REESCANEO, DETECCION_MARGEN, DETECCION_ESCALA)
+
+    seguidor = SeguidorPoses(POSE_MIN_CUTOFF, POSE_BETA, POSE_D_CUTOFF, POSE_MAX_PREDICCION) if POSE_FILTRO else None
+    if RENDER_MODO == "impostores":
+        escena = EscenaImpostores(cameraMatrix, ancho, alto, AtlasImpostores(IMPOSTORES_DIRECTORIO))
+        print(f"🖼️ Modo impostor: {len(escena.atlas.entradas)} atlas en {IMPOSTORES_DIRECTORIO}")
+    else:
+        escena = EscenaCompartida(cameraMatrix, ancho, alto, ESCENA_MAX_MODELOS, ESCENA_PRESUPUESTO_MB,
+                                  ILUMINACION, RENDER_RECORTE, RENDER_ESCALA, RENDER_FPS_OBJETIVO,
+                                  RENDER_LECTURA_ASINCRONA, ANIMACION_FPS, RENDER_TOLERANCIA_POSE,
+                                  RENDER_COMPOSICION_GPU, RENDER_INSTANCIAS)
+    # Precompilación de shaders repartida entre los primeros frames (ver bucle principal)
+    calentamiento = Calentamiento(escena, precarga=precarga) if RENDER_CALENTAR and RENDER_MODO == "3d" else None
+    pipeline = FramePipeline(ar, detector, cameraMatrix, distCoeffs, state, escena,
+                             seguidor=seguidor, intervalo_deteccion=DETECCION_INTERVALO,
+                             ocultar_marcadores=OCULTAR_MARCADORES)
 
     # --- Inicializar Gestor de Juegos ---
     gestor = GestorJuegosAR(ui_renderer=None, voice_system=tts_manager, game_state=state)
@@ -86,13 +116,16 @@ def main():
 
     try:
         while True:
-            ret, frame = ar.read()
-            if not ret:
+            # Render principal (UI + AR + Tina), una sola pasada por frame
+            if pipeline.procesar() is None:
                 continue
 
-            # Render principal (UI + AR + Tina)
-            frame = render_ui(frame, state, detector, cameraMatrix, distCoeffs, escenas, tts_manager)
-            cv2.imshow("Kids&Veggies - Luminia", frame)
+            # Un modelo representativo por frame hasta tener compilados todos los materiales
+            if calentamiento is not None and calentamiento.paso():
+                print(f"🔥 Shaders precompilados: {calentamiento.combinaciones} combinaciones de material "
+                      f"({calentamiento.dibujados} modelos) en {calentamiento.segundos:.2f} s de render, "
+                      f"{time.perf_counter() - calentamiento.inicio:.1f} s desde el arranque")
+                calentamiento = None
 
             # Salida manual
             if state.fase == "salir" or cv2.waitKey(1) == 27:
@@ -112,6 +145,10 @@ def main():
         voice_thread_active[0] = False
         if tts_manager:
             tts_manager.stop()
+        if CAPTURA_EN_HILO:
+            print(f"📉 Frames de cámara descartados por llegar tarde: {ar.frames_descartados}")
+        if precarga is not None:
+            precarga.detener()
         ar.release()
         cv2.destroyAllWindows()
         print("✅ Kids&Veggies cerrado correctamente")
@@ -0,0 +1,457 @@
+# assets_compilados.py
+# Compilación offline de los GLB de models.modelos.rutas_* a una caché de carga rápida:
+# mallas con niveles de detalle (LOD) simplificados, texturas reducidas, límites y normalización precalculados
+# y un formato binario (.npz sin comprimir) que se reconstruye sin pasar por el parser glTF.
+# Uso (desde la raíz del proyecto): python -m models.assets_compilados [--forzar] [--textura-max 512] ...
+import os
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+import pygfx as gfx
+from pygfx.utils import load_gltf as _gltf
+
+from models.cache_assets import AssetGLTF
+from models.normalizacion import calcular_normalizacion
+
+DIRECTORIO = "data/assets"
+MANIFIESTO = "manifest.json"
+VERSION = 3
+
+# Propiedades escalares de material que se conservan (las que no tenga el material se ignoran)
+PROPIEDADES_MATERIAL = [
+    "color", "color_mode", "emissive", "emissive_intensity", "roughness", "metalness", "opacity",
+    "side", "normal_scale", "flat_shading", "alpha_test",
+]
+MAPAS_MATERIAL = ["map", "normal_map", "ao_map", "emissive_map", "roughness_map", "metalness_map", "light_map"]
+# Propiedades y mapas propios de cada tipo de material, además de los comunes. Un asset con
+# materiales de otro tipo no se compila y se sigue cargando desde el GLB
+PROPIEDADES_TIPO = {
+    "MeshBasicMaterial": [],
+    "MeshStandardMaterial": [],
+    "MeshPhysicalMaterial": [
+        "ior", "specular", "specular_intensity", "clearcoat", "clearcoat_roughness", "clearcoat_normal_scale",
+        "iridescence", "iridescence_ior", "iridescence_thickness_range", "anisotropy", "anisotropy_rotation",
+        "sheen", "sheen_color", "sheen_roughness",
+    ],
+}
+MAPAS_TIPO = {
+    "MeshPhysicalMaterial": [
+        "specular_map", "specular_intensity_map", "clearcoat_map", "clearcoat_roughness_map",
+        "clearcoat_normal_map", "iridescence_map", "iridescence_thickness_map", "anisotropy_map",
+        "sheen_color_map", "sheen_roughness_map",
+    ],
+}
+PROPIEDADES_MAPA = ["uv_channel", "mag_filter", "min_filter", "mipmap_filter", "wrap_s", "wrap_t"]
+
+
+def _array(valor):
+    return np.ascontiguousarray(getattr(valor, "data", valor))
+
+
+# ----------------------------------------------------------
+# SIMPLIFICACIÓN DE MALLAS
+# ----------------------------------------------------------
+def decimar(atributos, indices, divisiones):
+    """
+    Simplifica una malla triangular por agrupamiento de vértices: el volumen se divide en
+    `divisiones` celdas a lo largo de la diagonal y los vértices de una misma celda (y con
+    normal parecida, para no suavizar aristas vivas) se funden en uno.
+    Devuelve (atributos, indices) nuevos; los atributos por vértice toman el valor del vértice
+    representante, por lo que huesos, pesos y UV siguen siendo válidos.
+    """
+    posiciones = atributos["positions"]
+    minimo = posiciones.min(axis=0)
+    celda = max(float(np.linalg.norm(posiciones.max(axis=0) - minimo)) / divisiones, 1e-9)
+    clave = np.floor((posiciones - minimo) / celda).astype(np.int64)
+    if "normals" in atributos:
+        clave = np.hstack([clave, np.round(atributos["normals"] * 1.5).astype(np.int64)])
+    _, representantes, inversa = np.unique(clave, axis=0, return_index=True, return_inverse=True)
+
+    triangulos = inversa.ravel()[indices]
+    validos = ((triangulos[:, 0] != triangulos[:, 1]) & (triangulos[:, 1] != triangulos[:, 2])
+               & (triangulos[:, 0] != triangulos[:, 2]))
+    triangulos = triangulos[validos]
+    # Triángulos repetidos tras la fusión
+    _, unicos = np.unique(np.sort(triangulos, axis=1), axis=0, return_index=True)
+    triangulos = triangulos[np.sort(unicos)]
+
+    n = len(posiciones)
+    nuevos = {}
+    for nombre, datos in atributos.items():
+        if isinstance(datos, list):
+            nuevos[nombre] = [d[representantes] for d in datos]
+        elif len(datos) == n:
+            nuevos[nombre] = datos[representantes]
+    return nuevos, triangulos.astype(np.int32)
+
+
+# ----------------------------------------------------------
+# COMPILACIÓN
+# ----------------------------------------------------------
+def parametros_compilacion(divisiones, textura_max, comprimir_texturas):
+    # Ajustes que cambian el .npz generado: si difieren de los del manifiesto hay que recompilar
+    return {"divisiones": [int(d) for d in divisiones], "textura_max": int(textura_max),
+            "comprimir_texturas": bool(comprimir_texturas)}
+
+
+def compilar_asset(origen, destino, divisiones=(64, 32), textura_max=512, comprimir_texturas=False,
+                   normalizar=None):
+    """
+    Compila un GLB a `destino` (.npz). Devuelve los metadatos del asset para el manifiesto.
+    `normalizar` son los parámetros (rotacion, escala, tamano) con los que se precalcula
+    la normalización del modelo.
+    """
+    gltf = gfx.load_gltf(origen, quiet=True)
+    escena = gltf.scene if gltf.scene is not None else gltf.scenes[0]
+
+    arrays = {}
+    nodos, geometrias, materiales, texturas, animaciones = [], [], [], [], []
+    ids_nodo, ids_geometria, ids_material, ids_textura = {}, {}, {}, {}
+    triangulos = [0] * (len(divisiones) + 1)
+
+    def textura(tex):
+        if id(tex) in ids_textura:
+            return ids_textura[id(tex)]
+        ti = ids_textura[id(tex)] = len(texturas)
+        datos = _array(tex)
+        info = {"dim": tex.dim, "colorspace": tex.colorspace,
+                "mipmaps": bool(getattr(tex, "_generate_mipmaps", False)), "formato": "raw"}
+        if datos.ndim == 3 and max(datos.shape[:2]) > textura_max:
+            f = textura_max / max(datos.shape[:2])
+            datos = cv2.resize(datos, (max(1, round(datos.shape[1] * f)), max(1, round(datos.shape[0] * f))),
+                               interpolation=cv2.INTER_AREA)
+        if comprimir_texturas and datos.dtype == np.uint8 and datos.ndim == 3 and datos.shape[2] in (3, 4):
+            conversion = cv2.COLOR_RGBA2BGRA if datos.shape[2] == 4 else cv2.COLOR_RGB2BGR
+            datos = np.frombuffer(cv2.imencode(".png", cv2.cvtColor(datos, conversion))[1], np.uint8)
+            info["formato"] = "png"
+        arrays[f"t{ti}"] = datos
+        texturas.append(info)
+        return ti
+
+    def material(mat):
+        if id(mat) in ids_material:
+            return ids_material[id(mat)]
+        tipo = type(mat).__name__
+        if tipo not in PROPIEDADES_TIPO:
+            raise ValueError(f"material {tipo} no soportado (se usará el GLB)")
+        mi = ids_material[id(mat)] = len(materiales)
+        info = {"tipo": tipo, "propiedades": {}, "mapas": {}}
+        for nombre in PROPIEDADES_MATERIAL + PROPIEDADES_TIPO[tipo]:
+            if hasattr(mat, nombre):
+                valor = getattr(mat, nombre)
+                valor = getattr(valor, "rgba", valor)  # gfx.Color
+                info["propiedades"][nombre] = np.asarray(valor).tolist() if not isinstance(valor, str) else valor
+        for nombre in MAPAS_MATERIAL + MAPAS_TIPO.get(tipo, []):
+            mapa = getattr(mat, nombre, None)
+            if mapa is not None:
+                info["mapas"][nombre] = {"textura": textura(mapa.texture),
+                                         **{p: getattr(mapa, p) for p in PROPIEDADES_MAPA}}
+        materiales.append(info)
+        return mi
+
+    def geometria(geo, triangular):
+        if id(geo) in ids_geometria:
+            return ids_geometria[id(geo)]
+        gi = ids_geometria[id(geo)] = len(geometrias)
+        atributos, extra = {}, {}
+        for nombre, valor in geo.items():
+            if nombre.startswith("_"):
+                continue
+            if isinstance(valor, list):
+                atributos[nombre] = [_array(v) for v in valor]
+            elif isinstance(valor, (gfx.Buffer, np.ndarray)):
+                atributos[nombre] = _array(valor)
+            else:
+                extra[nombre] = valor
+        indices = atributos.pop("indices", None)
+        if indices is not None:
+            indices = indices.reshape(-1, 3) if triangular else indices
+
+        niveles = []
+        for nivel, div in enumerate((None,) + tuple(divisiones)):
+            if nivel > 0:
+                if not triangular or indices is None or "positions" not in atributos:
+                    break
+                nuevos, nuevos_indices = decimar(atributos, indices, div)
+                # Un nivel que apenas reduce triángulos no merece la pena
+                if len(nuevos_indices) == 0 or len(nuevos_indices) > 0.9 * len(indices_nivel):
+                    continue
+                atributos_nivel, indices_nivel = nuevos, nuevos_indices
+            else:
+                atributos_nivel, indices_nivel = atributos, indices
+            for nombre, datos in atributos_nivel.items():
+                if isinstance(datos, list):
+                    for k, d in enumerate(datos):
+                        arrays[f"g{gi}_l{nivel}_{nombre}_{k}"] = d
+                else:
+                    arrays[f"g{gi}_l{nivel}_{nombre}"] = datos
+            if indices_nivel is not None:
+                arrays[f"g{gi}_l{nivel}_indices"] = indices_nivel
+            niveles.append(nivel)
+        # Los niveles que no se generan usan el anterior disponible
+        if triangular and indices is not None:
+            for nivel in range(len(divisiones) + 1):
+                disponible = max(n for n in niveles if n <= nivel)
+                triangulos[nivel] += len(arrays[f"g{gi}_l{disponible}_indices"])
+
+        geometrias.append({
+            "atributos": [n for n, d in atributos.items() if not isinstance(d, list)],
+            "morph": {n: len(d) for n, d in atributos.items() if isinstance(d, list)},
+            "indices": indices is not None,
+            "extra": extra,
+            "niveles": niveles,
+        })
+        return gi
+
+    def visitar(obj, padre):
+        ni = ids_nodo[obj] = len(nodos)
+        info = {"nombre": obj.name, "padre": padre, "visible": bool(obj.visible),
+                "matriz": np.asarray(obj.local.matrix).ravel().tolist()}
+        if isinstance(obj, gfx.Bone):
+            info["tipo"] = "Bone"
+        elif getattr(obj, "geometry", None) is not None and getattr(obj, "material", None) is not None:
+            info["tipo"] = type(obj).__name__
+            info["geometria"] = geometria(obj.geometry, isinstance(obj, gfx.Mesh))
+            info["material"] = material(obj.material)
+            if isinstance(obj, gfx.Mesh) and obj._morph_target_influences is not None:
+                info["morph"] = np.asarray(obj.morph_target_influences).tolist()
+                info["morph_nombres"] = list(obj.morph_target_names)
+        else:
+            info["tipo"] = "Group"
+        nodos.append(info)
+        for hijo in obj.children:
+            visitar(hijo, ni)
+
+    visitar(escena, None)
+
+    # Esqueletos
+    for obj, ni in ids_nodo.items():
+        if isinstance(obj, gfx.SkinnedMesh) and obj.skeleton is not None:
+            nodos[ni]["esqueleto"] = [ids_nodo[b] for b in obj.skeleton.bones]
+            nodos[ni]["bind"] = np.asarray(obj.bind_matrix).ravel().tolist()
+            if len(obj.skeleton.bone_inverses):
+                arrays[f"n{ni}_inversas"] = np.stack(obj.skeleton.bone_inverses)
+
+    # Animaciones
+    for ai, clip in enumerate(gltf.animations or []):
+        pistas = []
+        for pista in clip.tracks:
+            if pista.target not in ids_nodo:
+                continue
+            pi = len(pistas)
+            arrays[f"a{ai}_p{pi}_t"] = pista.times
+            arrays[f"a{ai}_p{pi}_v"] = pista.values
+            pistas.append({"nombre": pista.name, "nodo": ids_nodo[pista.target], "ruta": pista.path,
+                           "interpolacion": type(pista.interpolation).__name__})
+        animaciones.append({"nombre": clip.name, "duracion": float(clip.duration), "pistas": pistas})
+
+    estructura = {"version": VERSION, "nodos": nodos, "geometrias": geometrias,
+                  "materiales": materiales, "texturas": texturas, "animaciones": animaciones}
+    arrays["estructura"] = np.frombuffer(json.dumps(estructura).encode("utf-8"), np.uint8)
+    np.savez(destino, **arrays)
+
+    caja = escena.get_world_bounding_box()
+    esfera = escena.get_world_bounding_sphere()
+    return {
+        "archivo": os.path.basename(destino),
+        "mtime_origen": os.path.getmtime(origen),
+        "bytes_origen": os.path.getsize(origen),
+        "bytes_compilado": os.path.getsize(destino),
+        "triangulos": triangulos,
+        "caja": np.asarray(caja).tolist() if caja is not None else None,
+        "esfera": np.asarray(esfera).tolist() if esfera is not None else None,
+        "normalizacion": calcular_normalizacion(escena, *normalizar) if normalizar else None,
+        "parametros": parametros_compilacion(divisiones, textura_max, comprimir_texturas),
+    }
+
+
+# ----------------------------------------------------------
+# CARGA
+# ----------------------------------------------------------
+def _interpolante(nombre):
+    return getattr(gfx, nombre, None) or getattr(_gltf, nombre)
+
+
+def cargar_compilado(archivo, lod=1):
+    """
+    Reconstruye un asset compilado con el nivel de detalle `lod` (o el más cercano por debajo).
+    Devuelve un AssetGLTF como el de CacheAssets.
+    """
+    # El .npz se lee de forma perezosa: solo se descomprimen los arrays del LOD elegido
+    with np.load(archivo) as arrays:
+        return _reconstruir(arrays, lod)
+
+
+def _reconstruir(arrays, lod):
+    estructura = json.loads(arrays["estructura"].tobytes().decode("utf-8"))
+
+    texturas = []
+    for ti, info in enumerate(estructura["texturas"]):
+        datos = arrays[f"t{ti}"]
+        if info["formato"] == "png":
+            datos = cv2.imdecode(datos, cv2.IMREAD_UNCHANGED)
+            datos = cv2.cvtColor(datos, cv2.COLOR_BGRA2RGBA if datos.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+        texturas.append(gfx.Texture(datos, dim=info["dim"], colorspace=info["colorspace"],
+                                    generate_mipmaps=info["mipmaps"]))
+
+    materiales = []
+    for info in estructura["materiales"]:
+        mat = getattr(gfx, info["tipo"], gfx.MeshStandardMaterial)()
+        for nombre, valor in info["propiedades"].items():
+            setattr(mat, nombre, tuple(valor) if isinstance(valor, list) else valor)
+        for nombre, mapa in info["mapas"].items():
+            mapa = dict(mapa)
+            setattr(mat, nombre, gfx.TextureMap(texturas[mapa.pop("textura")], **mapa))
+        materiales.append(mat)
+
+    geometrias = []
+    for gi, info in enumerate(estructura["geometrias"]):
+        nivel = max(n for n in info["niveles"] if n <= max(lod, 0))
+        prefijo = f"g{gi}_l{nivel}_"
+        atributos = {n: arrays[prefijo + n] for n in info["atributos"]}
+        if info["indices"]:
+            atributos["indices"] = arrays[prefijo + "indices"]
+        geo = gfx.Geometry(**atributos)
+        for nombre, cantidad in info["morph"].items():
+            setattr(geo, nombre, [arrays[f"{prefijo}{nombre}_{k}"] for k in range(cantidad)])
+        for nombre, valor in info["extra"].items():
+            setattr(geo, nombre, valor)
+        geometrias.append(geo)
+
+    nodos = []
+    for info in estructura["nodos"]:
+        if info["tipo"] == "Bone":
+            obj = gfx.Bone()
+        elif "geometria" in info:
+            obj = getattr(gfx, info["tipo"])(geometrias[info["geometria"]], materiales[info["material"]])
+            if "morph" in info:
+                obj.morph_target_influences = info["morph"]
+                obj.morph_target_names.extend(info["morph_nombres"])
+        else:
+            obj = gfx.Group()
+        obj.name = info["nombre"]
+        obj.visible = info["visible"]
+        obj.local.matrix = np.array(info["matriz"], dtype=np.float32).reshape(4, 4)
+        if info["padre"] is not None:
+            nodos[info["padre"]].add(obj)
+        nodos.append(obj)
+
+    for ni, info in enumerate(estructura["nodos"]):
+        if "esqueleto" in info:
+            inversas = arrays[f"n{ni}_inversas"] if f"n{ni}_inversas" in arrays.files else None
+            esqueleto = gfx.Skeleton([nodos[b] for b in info["esqueleto"]],
+                                     list(inversas) if inversas is not None else None)
+            nodos[ni].bind(esqueleto, np.array(info["bind"], dtype=np.float32).reshape(4, 4))
+
+    clips = []
+    for ai, info in enumerate(estructura["animaciones"]):
+        pistas = [gfx.KeyframeTrack(p["nombre"], nodos[p["nodo"]], p["ruta"],
+                                    arrays[f"a{ai}_p{pi}_t"], arrays[f"a{ai}_p{pi}_v"],
+                                    _interpolante(p["interpolacion"]))
+                  for pi, p in enumerate(info["pistas"])]
+        clips.append(gfx.AnimationClip(info["nombre"], info["duracion"], pistas))
+
+    return AssetGLTF(nodos[0], clips)
+
+
+class AssetsCompilados:
+    """
+    Manifiesto de la caché compilada. Un asset solo se usa si su GLB de origen no ha
+    cambiado desde que se compiló; si no, se vuelve a cargar el GLB original.
+    """
+
+    def __init__(self, directorio=DIRECTORIO, lod=1):
+        self.directorio = directorio
+        self.lod = lod
+        self.entradas = {}
+        ruta = os.path.join(directorio, MANIFIESTO)
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                manifiesto = json.load(f)
+            if manifiesto.get("version") == VERSION:
+                self.entradas = manifiesto.get("assets", {})
+
+    @staticmethod
+    def clave(ruta):
+        return os.path.relpath(os.path.abspath(ruta)).replace(os.sep, "/")
+
+    def buscar(self, ruta):
+        """Ruta del .npz compilado para `ruta`, o None si no hay uno vigente."""
+        entrada = self.entradas.get(self.clave(ruta))
+        if entrada is None:
+            return None
+        archivo = os.path.join(self.directorio, entrada["archivo"])
+        try:
+            vigente = os.path.getmtime(ruta) == entrada["mtime_origen"] and os.path.exists(archivo)
+        except OSError:
+            return None
+        return archivo if vigente else None
+
+    def metadatos(self, ruta):
+        return self.entradas.get(self.clave(ruta))
+
+    def cargar(self, ruta):
+        asset = cargar_compilado(self.buscar(ruta), self.lod)
+        normalizacion = self.metadatos(ruta).get("normalizacion")
+        if normalizacion:
+            asset.metadatos["normalizaciones"] = [normalizacion]
+        return asset
+
+
+# ----------------------------------------------------------
+# LÍNEA DE COMANDOS
+# ----------------------------------------------------------
+def compilar_todo(directorio=DIRECTORIO, divisiones=(64, 32), textura_max=512,
+                  comprimir_texturas=False, forzar=False):
+    from models import modelos
+
+    os.makedirs(directorio, exist_ok=True)
+    previos = AssetsCompilados(directorio)
+    rutas = sorted({ruta for nombre, dic in vars(modelos).items()
+                    if nombre.startswith("rutas_") and isinstance(dic, dict) for ruta in dic.values()})
+    parametros = parametros_compilacion(divisiones, textura_max, comprimir_texturas)
+    assets = {}
+    total_origen = total_compilado = 0
+    for ruta in rutas:
+        clave = AssetsCompilados.clave(ruta)
+        if not os.path.exists(ruta):
+            print(f"[Compilar] ⚠️ No existe {ruta}")
+            continue
+        # Se reutiliza si el GLB no ha cambiado y se compiló con los mismos ajustes
+        if not forzar and previos.buscar(ruta) and previos.entradas[clave].get("parametros") == parametros:
+            assets[clave] = previos.entradas[clave]
+        else:
+            destino = os.path.join(directorio, clave.replace("/", "__").rsplit(".", 1)[0] + ".npz")
+            inicio = time.perf_counter()
+            try:
+                assets[clave] = compilar_asset(ruta, destino, divisiones, textura_max, comprimir_texturas,
+                                               modelos.parametros_normalizacion(ruta))
+            except Exception as e:
+                print(f"[Compilar] ❌ {ruta}: {e}")
+                continue
+            e = assets[clave]
+            print(f"[Compilar] {ruta}: {e['bytes_origen'] / 1e6:.1f} MB → {e['bytes_compilado'] / 1e6:.1f} MB, "
+                  f"triángulos {' / '.join(str(t) for t in e['triangulos'])} "
+                  f"({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+        total_origen += assets[clave]["bytes_origen"]
+        total_compilado += assets[clave]["bytes_compilado"]
+
+    with open(os.path.join(directorio, MANIFIESTO), "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION, "divisiones": list(divisiones), "textura_max": textura_max,
+                   "assets": assets}, f, indent=1)
+    print(f"[Compilar] {len(assets)} assets: {total_origen / 1e6:.1f} MB → {total_compilado / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compila los GLB de models.modelos a la caché de carga rápida")
+    parser.add_argument("--salida", default=DIRECTORIO, help="Directorio de la caché compilada")
+    parser.add_argument("--divisiones", type=int, nargs="*", default=[64, 32],
+                        help="Resolución de la rejilla de simplificación de cada LOD (LOD0 es la malla original)")
+    parser.add_argument("--textura-max", type=int, default=512, help="Lado máximo de las texturas en píxeles")
+    parser.add_argument("--comprimir-texturas", action="store_true", help="Guarda las texturas en PNG")
+    parser.add_argument("--forzar", action="store_true", help="Recompila aunque el GLB no haya cambiado")
+    args = parser.parse_args()
+    compilar_todo(args.salida, args.divisiones, args.textura_max, args.comprimir_texturas, args.forzar)
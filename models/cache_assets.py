@@ -0,0 +1,196 @@
+import os
+import copy
+import threading
+from collections import OrderedDict
+
+import pygfx as gfx
+
+
+class AssetGLTF:
+    """
+    Resultado de cargar un GLB, con la misma forma que el de gfx.load_gltf
+    (scene, scenes, animations) para que modeloGLTF lo use sin cambios.
+    """
+
+    def __init__(self, scene, animations, metadatos=None):
+        self.scene = scene
+        self.scenes = [scene]
+        self.animations = animations
+        # Datos precalculados del asset (normalización, límites...), compartidos con sus clones
+        self.metadatos = metadatos if metadatos is not None else {}
+
+
+def _clonar_nodo(nodo, mapa):
+    # Los objetos con geometría se recrean compartiendo geometría y material:
+    # los buffers y texturas ya subidos a la GPU no se duplican
+    if isinstance(nodo, gfx.Bone):
+        clon = gfx.Bone()
+    elif getattr(nodo, "geometry", None) is not None and getattr(nodo, "material", None) is not None:
+        clon = type(nodo)(nodo.geometry, nodo.material)
+        if isinstance(nodo, gfx.Mesh) and nodo._morph_target_influences is not None:
+            clon.morph_target_influences = nodo.morph_target_influences
+            clon.morph_target_names.extend(nodo.morph_target_names)
+    else:
+        clon = gfx.Group()
+    clon.name = nodo.name
+    clon.visible = nodo.visible
+    clon.local.matrix = nodo.local.matrix
+    mapa[nodo] = clon
+    for hijo in nodo.children:
+        clon.add(_clonar_nodo(hijo, mapa))
+    return clon
+
+
+def clonar_escena(scene, animations=None, metadatos=None):
+    """
+    Copia el grafo de escena de un asset: nodos nuevos (transformaciones y animaciones propias)
+    que comparten geometría, materiales y texturas con el original.
+    """
+    mapa = {}
+    clon = _clonar_nodo(scene, mapa)
+
+    # Los esqueletos apuntan a los huesos del clon
+    for original, copia in mapa.items():
+        if isinstance(original, gfx.SkinnedMesh) and original.skeleton is not None:
+            esqueleto = gfx.Skeleton([mapa.get(b, b) for b in original.skeleton.bones],
+                                     original.skeleton.bone_inverses)
+            copia.bind(esqueleto, original.bind_matrix)
+
+    # Las pistas de animación se redirigen a los nodos del clon (los datos de keyframes se comparten)
+    clips = []
+    for clip in animations or []:
+        pistas = []
+        for pista in clip.tracks:
+            if pista.target not in mapa:
+                continue
+            pista = copy.copy(pista)
+            pista.target = mapa[pista.target]
+            pistas.append(pista)
+        clips.append(gfx.AnimationClip(clip.name, clip.duration, pistas))
+
+    return AssetGLTF(clon, clips, metadatos)
+
+
+def estimar_memoria(scene):
+    """Bytes aproximados de geometría y texturas de un grafo de escena (cada recurso se cuenta una vez)."""
+    vistos = set()
+    total = 0
+
+    def contar(recurso):
+        nonlocal total
+        if recurso is None or id(recurso) in vistos:
+            return
+        vistos.add(id(recurso))
+        total += recurso.nbytes or 0
+
+    for obj in scene.iter():
+        geometria = getattr(obj, "geometry", None)
+        if geometria is not None:
+            for valor in geometria.values():
+                for recurso in (valor if isinstance(valor, list) else [valor]):
+                    if isinstance(recurso, (gfx.Buffer, gfx.Texture)):
+                        contar(recurso)
+        material = getattr(obj, "material", None)
+        if material is not None:
+            for nombre in dir(material):
+                if nombre.endswith("map") and not nombre.startswith("_"):
+                    mapa = getattr(material, nombre, None)
+                    contar(getattr(mapa, "texture", None))
+    return total
+
+
+class CacheAssets:
+    """
+    Caché LRU de GLB parseados para todo el proceso, con clave (ruta, fecha de modificación).
+    Guarda la geometría, texturas y animaciones de cada asset y entrega clones baratos que
+    comparten los buffers de GPU. Si la memoria estimada supera el presupuesto se descartan
+    los assets usados hace más tiempo (los clones vivos mantienen sus recursos).
+    Se puede usar desde varios hilos: si un asset ya se está cargando en otro hilo
+    se espera a esa carga en lugar de repetirla.
+    Con `compilados` (AssetsCompilados) se prefiere la versión compilada de cada GLB si está vigente.
+    """
+
+    def __init__(self, presupuesto_mb=512, compilados=None):
+        self.presupuesto = presupuesto_mb * 1024 * 1024
+        self.compilados = compilados
+        self.memoria = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._assets = OrderedDict()  # ruta -> (mtime, gltf, bytes)
+        self._cargando = {}           # ruta -> threading.Event de la carga en curso
+        self._lock = threading.Lock()
+
+    def __contains__(self, ruta):
+        ruta = os.path.abspath(ruta)
+        try:
+            mtime = os.path.getmtime(ruta)
+        except OSError:
+            return False
+        with self._lock:
+            return ruta in self._assets and self._assets[ruta][0] == mtime
+
+    def __len__(self):
+        return len(self._assets)
+
+    def cargar(self, ruta):
+        """Devuelve el asset original (no modificar: lo comparten todos los clones)."""
+        ruta = os.path.abspath(ruta)
+        mtime = os.path.getmtime(ruta)
+        while True:
+            with self._lock:
+                entrada = self._assets.get(ruta)
+                if entrada is not None and entrada[0] == mtime:
+                    self.aciertos += 1
+                    self._assets.move_to_end(ruta)
+                    return entrada[1]
+                evento = self._cargando.get(ruta)
+                if evento is None:
+                    # No está o el fichero ha cambiado en disco: lo carga este hilo
+                    self.fallos += 1
+                    self._descartar(ruta)
+                    evento = self._cargando[ruta] = threading.Event()
+                    break
+            evento.wait()
+
+        try:
+            if self.compilados is not None and self.compilados.buscar(ruta):
+                asset = self.compilados.cargar(ruta)
+            else:
+                gltf = gfx.load_gltf(ruta, quiet=True)
+                scene = gltf.scene if gltf.scene is not None else gltf.scenes[0]
+                asset = AssetGLTF(scene, gltf.animations or [])
+            memoria = estimar_memoria(asset.scene)
+            with self._lock:
+                self._assets[ruta] = (mtime, asset, memoria)
+                self.memoria += memoria
+                self._ajustar_presupuesto()
+            return asset
+        finally:
+            with self._lock:
+                del self._cargando[ruta]
+            evento.set()
+
+    def instancia(self, ruta):
+        """Clon independiente del asset, listo para colocarlo en una escena."""
+        asset = self.cargar(ruta)
+        return clonar_escena(asset.scene, asset.animations, asset.metadatos)
+
+    def descartar(self, ruta):
+        with self._lock:
+            self._descartar(os.path.abspath(ruta))
+
+    def limpiar(self):
+        with self._lock:
+            self._assets.clear()
+            self.memoria = 0
+
+    def _descartar(self, ruta):
+        entrada = self._assets.pop(ruta, None)
+        if entrada is not None:
+            self.memoria -= entrada[2]
+
+    def _ajustar_presupuesto(self):
+        # El último asset cargado se conserva aunque por sí solo supere el presupuesto
+        while self.memoria > self.presupuesto and len(self._assets) > 1:
+            _, (_, _, memoria) = self._assets.popitem(last=False)
+            self.memoria -= memoria
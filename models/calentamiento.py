@@ -0,0 +1,123 @@
+# calentamiento.py
+# Precompilación de shaders y pipelines al arrancar: pygfx/wgpu compila el pipeline de cada
+# combinación de material la primera vez que la dibuja, lo que congela el frame en que aparece
+# un modelo nuevo. Aquí se elige un asset representativo de cada combinación de material de los
+# GLB de models.modelos.rutas_* (leyendo solo la cabecera JSON del GLB) y se dibujan una vez,
+# de uno en uno durante los primeros frames.
+import os
+import json
+import struct
+import time
+from collections import deque
+
+from models.precarga import ESPECULATIVA
+
+# Atributos de vértice que cambian el shader (POSITION, NORMAL y TEXCOORD_0 los tienen casi todos)
+ATRIBUTOS_SHADER = ("COLOR_0", "JOINTS_0", "TEXCOORD_1", "TANGENT")
+TEXTURAS_PBR = ("baseColorTexture", "metallicRoughnessTexture")
+TEXTURAS_MATERIAL = ("normalTexture", "occlusionTexture", "emissiveTexture")
+
+
+def leer_json_glb(ruta):
+    """Cabecera JSON de un GLB, sin leer los buffers binarios."""
+    with open(ruta, "rb") as f:
+        magia, _, _ = struct.unpack("<4sII", f.read(12))
+        if magia != b"glTF":
+            raise ValueError(f"{ruta} no es un GLB")
+        longitud, tipo = struct.unpack("<I4s", f.read(8))
+        if tipo != b"JSON":
+            raise ValueError(f"{ruta}: el primer bloque del GLB no es JSON")
+        return json.loads(f.read(longitud))
+
+
+def combinaciones_material(ruta):
+    """
+    Conjunto de combinaciones (material, atributos de vértice, tipo de primitiva) de las
+    primitivas del asset: dos primitivas con la misma combinación usan el mismo pipeline.
+    """
+    gltf = leer_json_glb(ruta)
+    materiales = gltf.get("materials", [])
+    combinaciones = set()
+    for malla in gltf.get("meshes", []):
+        for primitiva in malla.get("primitives", []):
+            material = materiales[primitiva["material"]] if "material" in primitiva else {}
+            pbr = material.get("pbrMetallicRoughness", {})
+            combinaciones.add((
+                tuple(t for t in TEXTURAS_PBR if t in pbr),
+                tuple(t for t in TEXTURAS_MATERIAL if t in material),
+                material.get("alphaMode", "OPAQUE"),
+                material.get("doubleSided", False),
+                "KHR_materials_unlit" in material.get("extensions", {}),
+                tuple(a for a in ATRIBUTOS_SHADER if a in primitiva.get("attributes", {})),
+                "targets" in primitiva,
+                primitiva.get("mode", 4),
+            ))
+    return combinaciones
+
+
+def representantes(rutas):
+    """
+    Lista mínima (por recubrimiento voraz) de assets que entre todos cubren todas las
+    combinaciones de material de las `rutas` que existen en disco.
+    Devuelve (rutas elegidas, número de combinaciones).
+    """
+    por_ruta = {}
+    for ruta in sorted(r for r in set(rutas) if os.path.exists(r)):
+        try:
+            por_ruta[ruta] = combinaciones_material(ruta)
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            print(f"[Calentamiento] ⚠️ {ruta}: {e}")
+    pendientes = set().union(*por_ruta.values()) if por_ruta else set()
+    total = len(pendientes)
+    elegidas = []
+    while pendientes:
+        ruta = max(por_ruta, key=lambda r: len(por_ruta[r] & pendientes))
+        elegidas.append(ruta)
+        pendientes -= por_ruta[ruta]
+    return elegidas, total
+
+
+class Calentamiento:
+    """
+    Calentamiento repartido entre los primeros frames para no retrasar el arranque: los
+    representantes se cargan en el hilo de precarga (si la hay) y paso(), llamado una vez por
+    frame desde el bucle principal, dibuja en `escena` (EscenaCompartida) como mucho uno ya cargado.
+    """
+
+    def __init__(self, escena, rutas=None, precarga=None):
+        from models import modelos
+
+        if rutas is None:
+            rutas = [ruta for nombre, dic in vars(modelos).items()
+                     if nombre.startswith("rutas_") and isinstance(dic, dict) for ruta in dic.values()]
+        self.escena = escena
+        self.precarga = precarga
+        elegidas, self.combinaciones = representantes(rutas)
+        self.pendientes = deque(elegidas)
+        self.dibujados = 0
+        self.segundos = 0.0  # Tiempo gastado en el hilo principal
+        self.inicio = time.perf_counter()
+        if precarga is not None:
+            precarga.solicitar_varias(elegidas, ESPECULATIVA)
+
+    @property
+    def terminado(self):
+        return not self.pendientes
+
+    def paso(self):
+        """Dibuja el siguiente representante si ya está cargado. Devuelve True al terminar."""
+        from models.modelos import cache_assets, crear_modelo
+
+        if not self.pendientes:
+            return True
+        ruta = self.pendientes[0]
+        if self.precarga is not None and self.precarga.pendiente(ruta) and ruta not in cache_assets:
+            return False
+        self.pendientes.popleft()
+        inicio = time.perf_counter()
+        try:
+            self.dibujados += self.escena.calentar([(ruta, crear_modelo(ruta))])
+        except Exception as e:
+            print(f"[Calentamiento] ❌ {ruta}: {e}")
+        self.segundos += time.perf_counter() - inicio
+        return not self.pendientes
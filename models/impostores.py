@@ -0,0 +1,190 @@
+# impostores.py
+# Generación offline de impostores: cada modelo de models.modelos.rutas_* se renderiza desde
+# N direcciones de vista × M instantes de su animación a un atlas de sprites RGBA, junto con el
+# plano 3D (en el sistema del marcador) sobre el que se apoya cada sprite. En modo impostor
+# (ar.impostores) se elige el sprite más cercano a la vista y se proyecta con una homografía.
+# Uso (desde la raíz del proyecto): python -m models.impostores [--tam 256] [--azimuts 8] ...
+import os
+import json
+import argparse
+
+import cv2
+import numpy as np
+
+DIRECTORIO = "data/impostores"
+MANIFIESTO = "manifest.json"
+VERSION = 1
+
+
+def direcciones_vista(azimuts=8, elevaciones=(20, 45, 70)):
+    """Vectores unitarios desde el modelo hacia la cámara (z: normal del marcador)."""
+    direcciones = []
+    for elevacion in np.radians(elevaciones):
+        for azimut in np.linspace(0, 2 * np.pi, azimuts, endpoint=False):
+            direcciones.append((np.cos(elevacion) * np.cos(azimut),
+                                np.cos(elevacion) * np.sin(azimut),
+                                np.sin(elevacion)))
+    return np.array(direcciones)
+
+
+def camara_sprite(centro, radio, direccion, tam, fov=30.0):
+    """
+    Cámara virtual (intrínsecos, rvec, tvec de OpenCV) que mira al centro de la esfera
+    envolvente desde `direccion`, a la distancia a la que la esfera llena el sprite.
+    """
+    focal = tam / 2 / np.tan(np.radians(fov) / 2)
+    distancia = radio / np.sin(np.radians(fov) / 2)
+    posicion = centro + distancia * direccion
+    z = -direccion
+    y = np.array([0.0, 0.0, -1.0])  # "Abajo" en la imagen = hacia el marcador
+    y = y - y.dot(z) * z
+    y /= np.linalg.norm(y)
+    x = np.cross(y, z)
+    R = np.array([x, y, z])
+    K = np.array([[focal, 0, (tam - 1) / 2], [0, focal, (tam - 1) / 2], [0, 0, 1.0]])
+    return K, cv2.Rodrigues(R)[0].ravel(), -R @ posicion, distancia
+
+
+def plano_sprite(K, rvec, tvec, distancia, tam):
+    # Esquinas del sprite llevadas al plano perpendicular a la vista que pasa por el centro del modelo
+    R = cv2.Rodrigues(np.asarray(rvec))[0]
+    esquinas = np.array([[-0.5, -0.5, 1], [tam - 0.5, -0.5, 1], [tam - 0.5, tam - 0.5, 1], [-0.5, tam - 0.5, 1]])
+    rayos = (np.linalg.inv(K) @ esquinas.T).T * distancia
+    return (R.T @ (rayos - tvec).T).T
+
+
+def generar_atlas(ruta, destino, tam=256, azimuts=8, elevaciones=(20, 45, 70), frames=8):
+    """
+    Renderiza los sprites de un asset y guarda el atlas (PNG BGRA) en `destino`.
+    Devuelve la entrada del manifiesto.
+    """
+    from ar.escena import EscenaCompartida
+    from models.modelos import crear_modelo
+
+    modelo = crear_modelo(ruta)
+    centro, radio = np.array(modelo.esfera[:3]), modelo.esfera[3]
+    clip = modelo.current_action if modelo.indice_animacion is not None else None
+    frames = frames if clip is not None else 1
+    direcciones = direcciones_vista(azimuts, elevaciones)
+    camaras = [camara_sprite(centro, radio, d, tam) for d in direcciones]
+
+    # Misma escena, iluminación y cámara calibrada que en el modo 3D; las animaciones
+    # solo avanzan a mano para muestrear instantes exactos del clip
+    escena = EscenaCompartida(camaras[0][0], tam, tam, recorte=False, tolerancia=None, fps_animacion=1e-9)
+    escena.agregar(0, modelo, ruta)
+    entrada = escena.entradas[(0, ruta)]
+
+    columnas = int(np.ceil(np.sqrt(len(direcciones) * frames)))
+    filas = int(np.ceil(len(direcciones) * frames / columnas))
+    atlas = np.zeros((filas * tam, columnas * tam, 4), dtype=np.uint8)
+    sprites = []
+    for f in range(frames):
+        if clip is not None and f > 0:
+            entrada.mixer.update(clip.duration / frames)
+        for v, (K, rvec, tvec, distancia) in enumerate(camaras):
+            imagen, _ = escena.render({0: (rvec, tvec)}, {0})
+            i = f * len(direcciones) + v
+            x, y = (i % columnas) * tam, (i // columnas) * tam
+            atlas[y:y + tam, x:x + tam] = imagen
+            sprites.append({"vista": v, "frame": f, "x": x, "y": y,
+                            "plano": plano_sprite(K, rvec, tvec, distancia, tam).tolist()})
+    escena.limpiar()
+
+    cv2.imwrite(destino, cv2.cvtColor(atlas, cv2.COLOR_RGBA2BGRA))
+    return {
+        "archivo": os.path.basename(destino),
+        "mtime_origen": os.path.getmtime(ruta),
+        "tam": tam,
+        "esfera": list(map(float, modelo.esfera)),
+        "direcciones": direcciones.tolist(),
+        "frames": frames,
+        "duracion": clip.duration if clip is not None else 0.0,
+        "sprites": sprites,
+    }
+
+
+class AtlasImpostores:
+    """
+    Manifiesto de los atlas de impostores. Los atlas se cargan la primera vez que se piden
+    y solo se usan si su GLB de origen no ha cambiado desde que se generaron.
+    """
+
+    def __init__(self, directorio=DIRECTORIO):
+        self.directorio = directorio
+        self.entradas = {}
+        self._atlas = {}
+        ruta = os.path.join(directorio, MANIFIESTO)
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                manifiesto = json.load(f)
+            if manifiesto.get("version") == VERSION:
+                self.entradas = manifiesto.get("assets", {})
+
+    @staticmethod
+    def clave(ruta):
+        return os.path.relpath(os.path.abspath(ruta)).replace(os.sep, "/")
+
+    def __contains__(self, ruta):
+        entrada = self.entradas.get(self.clave(ruta))
+        try:
+            return (entrada is not None and os.path.getmtime(ruta) == entrada["mtime_origen"]
+                    and os.path.exists(os.path.join(self.directorio, entrada["archivo"])))
+        except OSError:
+            return False
+
+    def cargar(self, ruta):
+        """(imagen RGBA del atlas, entrada del manifiesto con las direcciones en array)."""
+        clave = self.clave(ruta)
+        if clave not in self._atlas:
+            entrada = dict(self.entradas[clave])
+            entrada["direcciones"] = np.array(entrada["direcciones"])
+            entrada["esfera"] = np.array(entrada["esfera"])
+            entrada["sprites"] = [dict(s, plano=np.array(s["plano"], dtype=np.float64)) for s in entrada["sprites"]]
+            imagen = cv2.imread(os.path.join(self.directorio, entrada["archivo"]), cv2.IMREAD_UNCHANGED)
+            self._atlas[clave] = (cv2.cvtColor(imagen, cv2.COLOR_BGRA2RGBA), entrada)
+        return self._atlas[clave]
+
+
+# ----------------------------------------------------------
+# LÍNEA DE COMANDOS
+# ----------------------------------------------------------
+def generar_todo(directorio=DIRECTORIO, tam=256, azimuts=8, elevaciones=(20, 45, 70), frames=8, forzar=False):
+    from models import modelos
+
+    os.makedirs(directorio, exist_ok=True)
+    previos = AtlasImpostores(directorio)
+    rutas = sorted({ruta for nombre, dic in vars(modelos).items()
+                    if nombre.startswith("rutas_") and isinstance(dic, dict) for ruta in dic.values()})
+    assets = {}
+    for ruta in rutas:
+        clave = AtlasImpostores.clave(ruta)
+        if not os.path.exists(ruta):
+            print(f"[Impostores] ⚠️ No existe {ruta}")
+            continue
+        if not forzar and ruta in previos:
+            assets[clave] = previos.entradas[clave]
+            continue
+        destino = os.path.join(directorio, clave.replace("/", "__").rsplit(".", 1)[0] + ".png")
+        try:
+            assets[clave] = generar_atlas(ruta, destino, tam, azimuts, elevaciones, frames)
+        except Exception as e:
+            print(f"[Impostores] ❌ {ruta}: {e}")
+            continue
+        print(f"[Impostores] {ruta}: {len(assets[clave]['sprites'])} sprites de {tam}x{tam}")
+
+    with open(os.path.join(directorio, MANIFIESTO), "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION, "assets": assets}, f)
+    print(f"[Impostores] {len(assets)} atlas en {directorio}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los atlas de impostores de los modelos de models.modelos")
+    parser.add_argument("--salida", default=DIRECTORIO, help="Directorio de los atlas")
+    parser.add_argument("--tam", type=int, default=256, help="Lado de cada sprite en píxeles")
+    parser.add_argument("--azimuts", type=int, default=8, help="Vistas alrededor del modelo por cada elevación")
+    parser.add_argument("--elevaciones", type=float, nargs="*", default=[20, 45, 70],
+                        help="Elevaciones de las vistas en grados sobre el plano del marcador")
+    parser.add_argument("--frames", type=int, default=8, help="Instantes muestreados de la animación")
+    parser.add_argument("--forzar", action="store_true", help="Regenera aunque el GLB no haya cambiado")
+    args = parser.parse_args()
+    generar_todo(args.salida, args.tam, args.azimuts, args.elevaciones, args.frames, args.forzar)
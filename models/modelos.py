@@ -1,14 +1,48 @@
 import modules.cuia as cuia
 import numpy as np
 
+from config.rendimiento import ASSETS_PRESUPUESTO_MB, ASSETS_PRECARGA, ASSETS_COMPILADOS, ASSETS_LOD, RENDER_MODO
+from models.cache_assets import CacheAssets
+from models.assets_compilados import AssetsCompilados
+from models.precarga import PrecargaAssets, MUNDO
+from models.normalizacion import normalizacion
+
+# Caché de GLB parseados compartida por todo el proceso
+cache_assets = CacheAssets(ASSETS_PRESUPUESTO_MB,
+                           AssetsCompilados(ASSETS_COMPILADOS, ASSETS_LOD) if ASSETS_COMPILADOS else None)
+
+# Orientación y escala comunes de los modelos sobre el marcador
+ROTACION_MODELOS = (np.pi / 2.0, 0, 0)
+ESCALA_MODELOS = 0.15
+
+# Ajustes por asset para los modelos que vienen en otras unidades u orientación:
+#   ruta: {"escala": 0.05} | {"tamano": 0.25}  (lado mayor en metros) | {"rotacion": (x, y, z)}
+ajustes_modelos = {
+}
+
 # --------------------------------------------------------------
 # FUNCIÓN BASE
 # --------------------------------------------------------------
+def parametros_normalizacion(ruta):
+    """(rotacion, escala, tamano) con los que se coloca el modelo de `ruta` sobre su marcador."""
+    ajuste = ajustes_modelos.get(ruta, {})
+    tamano = ajuste.get("tamano")
+    escala = None if tamano is not None else ajuste.get("escala", ESCALA_MODELOS)
+    return tuple(ajuste.get("rotacion", ROTACION_MODELOS)), escala, tamano
+
+# Carga en segundo plano de los assets que se van a necesitar (None: carga síncrona al verlos).
+# En modo impostor no se cargan GLB durante el juego
+precarga = PrecargaAssets(cache_assets, parametros_normalizacion) if ASSETS_PRECARGA and RENDER_MODO == "3d" else None
+
 def crear_modelo(ruta):
-    modelo = cuia.modeloGLTF(ruta)
-    modelo.rotar((np.pi / 2.0, 0, 0))
-    modelo.escalar(0.15)
-    modelo.flotar()
+    # Clon del asset cacheado: no se vuelve a leer ni parsear el GLB
+    modelo = cuia.modeloGLTF()
+    modelo.gltf = cache_assets.instancia(ruta)
+    modelo.seleccionar_escena()
+    # Rotación, escala y apoyo sobre el marcador precalculados una vez por asset
+    norm = normalizacion(modelo.gltf, *parametros_normalizacion(ruta))
+    modelo.model_obj.local.matrix = np.array(norm["matriz"]).reshape(4, 4)
+    modelo.esfera = norm["esfera"]  # Esfera envolvente en el sistema del marcador
     animaciones = modelo.animaciones()
     if animaciones:
         modelo.animar(animaciones[0])
@@ -186,6 +220,27 @@ def obtener_ruta_por_categoria(categoria, nombre, desbloqueado=True):
         return dic.get(nombre + suffix, "")
     return dic.get(nombre if categoria != "numeros" else str(nombre), "")
 
+def rutas_mundo(mundo):
+    """Rutas de los modelos que usan los minijuegos de un mundo."""
+    rutas = {
+        "letras": [rutas_letras],
+        "animales": [rutas_animales],
+        "fruta_y_verdura": [rutas_frutas, rutas_verduras],
+        "numeros": [rutas_numeros],
+    }
+    return [ruta for dic in rutas.get(mundo, []) for ruta in dic.values()]
+
+def precargar_mundo(mundo, prioridad=MUNDO):
+    """
+    Pide a la precarga los modelos del mundo (y su castillo) sin bloquear.
+    Se puede llamar en cada frame: la precarga ignora los que ya están en caché o en cola,
+    y vuelve a pedir los que la caché haya descartado.
+    """
+    if precarga is None:
+        return
+    precarga.solicitar(obtener_ruta_por_categoria("castillo", mundo, True), prioridad)
+    precarga.solicitar_varias(rutas_mundo(mundo), prioridad)
+
 # --------------------------------------------------------------
 # CREAR FUNCIONES DINÁMICAMENTE
 # --------------------------------------------------------------
@@ -0,0 +1,48 @@
+import numpy as np
+import pylinalg as la
+
+from models.cache_assets import clonar_escena
+
+
+def calcular_normalizacion(scene, rotacion, escala=None, tamano=None):
+    """
+    Transformación que coloca un asset sobre su marcador: rotación, escala uniforme y traslación
+    en z para que apoye sobre el plano del marcador (lo que hacían rotar, escalar y flotar).
+    Con `tamano` la escala se elige para que el lado mayor del modelo mida eso en metros.
+    Devuelve un diccionario serializable con la matriz y la esfera envolvente ya normalizada.
+    """
+    # Se trabaja sobre un clon para no tocar la transformación del asset compartido
+    raiz = clonar_escena(scene).scene
+    raiz.local.matrix = np.eye(4)
+    if tamano is not None:
+        caja = raiz.get_world_bounding_box()
+        lado = float(np.max(caja[1] - caja[0])) if caja is not None else 0.0
+        escala = tamano / lado if lado > 0 else 1.0
+
+    raiz.local.matrix = la.mat_from_quat(la.quat_from_euler(rotacion)) @ la.mat_from_scale((escala, escala, escala))
+    caja = raiz.get_world_bounding_box()
+    if caja is not None:
+        raiz.local.matrix = la.mat_from_translation((0, 0, -caja[0][2])) @ raiz.local.matrix
+    esfera = raiz.get_world_bounding_sphere()
+    return {
+        "rotacion": list(map(float, rotacion)),
+        "escala": float(escala),
+        "tamano": tamano,
+        "matriz": raiz.local.matrix.ravel().tolist(),
+        "esfera": list(map(float, esfera)) if esfera is not None else None,
+    }
+
+
+def normalizacion(asset, rotacion, escala=None, tamano=None):
+    """
+    Normalización del asset para estos parámetros: la del manifiesto compilado si coincide,
+    o la calculada la primera vez que se pidió (se guarda en el asset para el resto de clones).
+    """
+    guardadas = asset.metadatos.setdefault("normalizaciones", [])
+    for n in guardadas:
+        if (np.allclose(n["rotacion"], rotacion) and n["tamano"] == tamano
+                and (tamano is not None or np.isclose(n["escala"], escala))):
+            return n
+    n = calcular_normalizacion(asset.scene, rotacion, escala, tamano)
+    guardadas.append(n)
+    return n
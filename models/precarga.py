@@ -0,0 +1,87 @@
+import itertools
+import queue
+import threading
+
+from models.normalizacion import normalizacion
+
+# Prioridades de las peticiones (menor = antes)
+URGENTE = 0        # Un marcador visible necesita el modelo para el próximo frame
+MUNDO = 1          # Assets del mundo recién elegido
+ESPECULATIVA = 2   # Assets que probablemente se usen pronto (mundos visibles en el menú)
+
+
+class PrecargaAssets:
+    """
+    Carga assets en la caché desde un hilo de fondo, en orden de prioridad.
+    Las peticiones urgentes adelantan a las especulativas que sigan en la cola;
+    una petición repetida con más prioridad sustituye a la anterior.
+    Con `parametros` (ruta -> (rotacion, escala, tamano)) también se deja calculada la
+    normalización de cada asset, que si no se calcularía al crear su primer modelo.
+    """
+
+    def __init__(self, cache, parametros=None):
+        self.cache = cache
+        self.parametros = parametros
+        self.errores = {}         # ruta -> mensaje de la carga fallida (no se reintenta)
+        self._cola = queue.PriorityQueue()
+        self._orden = itertools.count()  # Desempate FIFO entre peticiones de igual prioridad
+        self._pendientes = {}     # ruta -> mejor prioridad en cola
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._activo = False
+
+    def solicitar(self, ruta, prioridad=ESPECULATIVA):
+        if not ruta or ruta in self.errores or ruta in self.cache:
+            return
+        with self._lock:
+            if self._pendientes.get(ruta, prioridad + 1) <= prioridad:
+                return
+            self._pendientes[ruta] = prioridad
+        self._cola.put((prioridad, next(self._orden), ruta))
+        self._iniciar_hilo()
+
+    def solicitar_varias(self, rutas, prioridad=ESPECULATIVA):
+        for ruta in rutas:
+            self.solicitar(ruta, prioridad)
+
+    def pendiente(self, ruta):
+        with self._lock:
+            return ruta in self._pendientes
+
+    def detener(self):
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+            self._activo = False
+        if hilo is not None:
+            self._cola.put((-1, -1, None))  # Despierta al hilo
+            hilo.join(timeout=1.0)
+
+    def _iniciar_hilo(self):
+        # Se llama desde los hilos de render y de voz: comprobar y arrancar bajo el lock
+        # para no lanzar dos hilos de precarga
+        with self._lock:
+            if self._hilo is None:
+                self._activo = True
+                self._hilo = threading.Thread(target=self._precargar, daemon=True)
+                self._hilo.start()
+
+    def _precargar(self):
+        while self._activo:
+            prioridad, _, ruta = self._cola.get()
+            if ruta is None:
+                continue
+            with self._lock:
+                # Entrada obsoleta: la misma ruta se volvió a pedir con más prioridad
+                if self._pendientes.get(ruta) != prioridad:
+                    continue
+            try:
+                asset = self.cache.cargar(ruta)
+                # Además de parsear, deja calculada la normalización con la que crear_modelo lo coloca
+                if self.parametros is not None:
+                    normalizacion(asset, *self.parametros(ruta))
+            except Exception as e:
+                self.errores[ruta] = str(e)
+                print(f"[Precarga] No se pudo cargar {ruta}: {e}")
+            finally:
+                with self._lock:
+                    self._pendientes.pop(ruta, None)
@@ -4,6 +4,9 @@ import matplotlib as mpl
 from matplotlib import pyplot as plt
 import time
 import os
+import json
+import threading
+from collections import deque
 from wgpu.gui.offscreen import WgpuCanvas # Para el render offscreen
 import pygfx as gfx
 import pylinalg as la # Álgebra lineal para las transformaciones geométricas
@@ -48,25 +51,86 @@ def plot(image, titulo=None, axis=False):
         plt.imshow( cv2.cvtColor(image, cv2.COLOR_BGR2RGB) , aspect='equal')
 
 
-def bestBackend(camid):
-    backends = cv2.videoio_registry.getCameraBackends()
-    bestCap = 0
-    bestTime = 999
-    for b in backends:
-        start = time.time()
-        cam = cv2.VideoCapture(camid, b)
+def sondearBackend(camid, backend, timeout=None):
+    # Con timeout, el backend no puede tardar más de eso en abrir la cámara ni en dar un frame
+    params = []
+    if timeout:
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(timeout * 1000), cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(timeout * 1000)]
+    start = time.time()
+    cam = cv2.VideoCapture(camid, backend, params)
+    try:
+        if not cam.isOpened():
+            return None
+        # Algunos backends abren el dispositivo pero no entregan imágenes
+        if not cam.read()[0]:
+            return None
         end = time.time()
-        if cam.isOpened():
-            if end-start < bestTime:
-                bestTime = end-start
-                bestCap = b
-            cam.release()
-    return bestCap
+        return {
+            "backend": int(backend),
+            "nombre": cv2.videoio_registry.getBackendName(backend),
+            "tiempo": end-start,
+            "ancho": int(cam.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "alto": int(cam.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": cam.get(cv2.CAP_PROP_FPS),
+        }
+    finally:
+        # El dispositivo queda libre antes de probar el siguiente backend o abrir el elegido
+        cam.release()
+
+def _sondearEnOrden(camid, backends, timeout):
+    # Los backends se prueban de uno en uno, en el orden de preferencia de OpenCV, y se usa el
+    # primero que entrega un frame: abrirlos a la vez los haría competir por el mismo dispositivo
+    for b in backends:
+        try:
+            info = sondearBackend(camid, b, timeout)
+        except cv2.error:
+            info = None
+        if info is not None:
+            return info
+    return None
+
+def infoCamara(camid, cache="data/camaras.json", timeout=5.0, refrescar=False):
+    """
+    Devuelve el primer backend que entrega imágenes de la cámara, en el orden de preferencia de
+    OpenCV, junto con la resolución y FPS negociados.
+    El resultado se guarda en disco por dispositivo y se reutiliza en los siguientes arranques.
+    """
+    clave = str(camid)
+    datos = {}
+    if cache and os.path.exists(cache):
+        try:
+            with open(cache, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            datos = {}
+    info = datos.get(clave)
+    if not refrescar and info and info.get("opencv") == cv2.__version__:
+        return info
+
+    backends = cv2.videoio_registry.getCameraBackends()
+    info = _sondearEnOrden(camid, backends, timeout)
+    if info is None:
+        return {"backend": 0, "nombre": "ANY", "tiempo": 0.0, "ancho": 0, "alto": 0, "fps": 0.0}
+
+    info["opencv"] = cv2.__version__
+    if cache:
+        datos[clave] = info
+        carpeta = os.path.dirname(cache)
+        if carpeta and not os.path.exists(carpeta):
+            os.makedirs(carpeta)
+        with open(cache, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, indent=4)
+    return info
+
+def bestBackend(camid, cache="data/camaras.json", timeout=5.0, refrescar=False):
+    return infoCamara(camid, cache, timeout, refrescar)["backend"]
 
 class myVideo:
-    def __init__(self, source, backend=cv2.CAP_ANY):
+    def __init__(self, source, backend=cv2.CAP_ANY, hilo=False, buffer=2):
         self.loop = False      #Para indicar si el video reiniciará al terminar
         self.process = None    #Para indicar la función opcional de procesado de frames
+        self.frames_descartados = 0  #Frames capturados por el hilo que nunca se llegaron a leer
+        self._hilo = None
         if isinstance(source, str):
             if os.path.exists(source):
                 self._cap = cv2.VideoCapture(source)
@@ -83,19 +147,70 @@ class myVideo:
             self._cap = cv2.VideoCapture(source, backend)
             self._camera = True
 
+        if hilo and self._camera and self._cap.isOpened():
+            self._iniciar_hilo(buffer)
+
     def __del__(self):
-        self._cap.release()
+        self._liberar()
 
     def release(self):
-        self._cap.release()
+        self._liberar()
         del self
 
     def isOpened(self):
         return self._cap.isOpened()
 
+    def _iniciar_hilo(self, buffer):
+        # Buffer circular: el hilo siempre añade el frame más reciente y los antiguos se pierden
+        self._buffer = deque(maxlen=max(1, buffer))
+        self._condicion = threading.Condition()
+        self._capturados = 0   #Número de secuencia del último frame capturado
+        self._entregado = 0    #Número de secuencia del último frame devuelto por read()
+        self._capturando = True
+        self._hilo = threading.Thread(target=self._capturar, daemon=True)
+        self._hilo.start()
+
+    def _liberar(self):
+        if self._hilo is not None:
+            # La captura la libera el propio hilo al salir del bucle: si sigue bloqueado en
+            # cap.read() pasado el timeout, liberarla aquí la destruiría mientras la usa
+            self._capturando = False
+            self._hilo.join(timeout=1.0)
+            self._hilo = None
+        else:
+            self._cap.release()
+
+    def _capturar(self):
+        try:
+            while self._capturando:
+                ret, frame = self._cap.read()
+                if not ret:
+                    time.sleep(0.005)
+                    continue
+                with self._condicion:
+                    self._capturados += 1
+                    self._buffer.append((self._capturados, frame))
+                    self._condicion.notify()
+        finally:
+            self._cap.release()
+
+    def _leer_ultimo(self, timeout=1.0):
+        # Espera a que haya un frame más nuevo que el último entregado y descarta los intermedios
+        with self._condicion:
+            if not self._condicion.wait_for(lambda: self._capturados > self._entregado, timeout):
+                return (False, None)
+            indice, frame = self._buffer[-1]
+            self._buffer.clear()
+        self.frames_descartados += indice - self._entregado - 1
+        self._entregado = indice
+        return (True, frame)
+
     def read(self):
         if self._camera:
-            ret, frame = self._cap.read()
+            if self._hilo is not None:
+                ret, frame = self._leer_ultimo()
+            else:
+                ret, frame = self._cap.read()
             if ret and self.process != None:
                 frame = self.process(frame)
             return(ret, frame)
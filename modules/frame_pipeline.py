@@ -0,0 +1,140 @@
+# frame_pipeline.py
+import cv2
+import time
+
+from ar.deteccion import detectar_frame, DeteccionFrame, ocultar_marcadores_visualmente
+from modules.ui_renderer import (
+    TAM_MARCADOR,
+    seleccionar_modelos,
+    precargar_modelos,
+    renderizar_modelos,
+    componer_capas,
+    dibujar_ui,
+)
+
+
+class FrameAR:
+    """
+    Resultados intermedios de un frame a lo largo del pipeline.
+    Cada etapa deja aquí su salida para que las siguientes la reutilicen.
+    """
+
+    def __init__(self, indice, captura):
+        self.indice = indice        # Número de secuencia del frame
+        self.captura = captura      # Imagen tal como llega de la cámara
+        self.tiempo = time.perf_counter()  # Instante de captura (para el seguimiento de poses)
+        self.deteccion = None       # DeteccionFrame: esquinas, ids y poses de los marcadores
+        self.seleccion = []         # (marker_id, ruta) a dibujar en esta fase
+        self.capas = []             # (render RGBA, (x, y)) de cada pasada de render
+        self.imagen = captura       # Imagen final (compuesta + UI)
+
+    @property
+    def pose(self):
+        return self.deteccion.poses if self.deteccion is not None else {}
+
+    @property
+    def marcadores(self):
+        # Incluye los marcadores cuya pose se está prediciendo aunque no se hayan detectado
+        return set(self.pose.keys())
+
+
+class FramePipeline:
+    """
+    Pipeline por frame: captura → detección → pose → render → composición → UI → visualización.
+    El bucle principal llama a procesar() exactamente una vez por frame.
+    """
+
+    def __init__(self, video, detector, cameraMatrix, distCoeffs, state, escena,
+                 titulo="Kids&Veggies - Luminia", seguidor=None, intervalo_deteccion=1,
+                 ocultar_marcadores=None):
+        self.video = video
+        self.detector = detector
+        self.seguidor = seguidor                        # SeguidorPoses opcional (suavizado y predicción)
+        self.intervalo_deteccion = intervalo_deteccion  # Detectar 1 de cada N frames (requiere seguidor)
+        self.ocultar_marcadores = ocultar_marcadores    # None, "media" o "inpaint"
+        self.cameraMatrix = cameraMatrix
+        self.distCoeffs = distCoeffs
+        self.state = state
+        self.escena = escena                # EscenaCompartida: un solo renderer para todos los marcadores
+        self.titulo = titulo
+        self.indice = 0
+        self.fase = None    # Última fase renderizada (para liberar sus modelos al salir)
+
+    # ----------------------------------------------------------
+    # ETAPAS
+    # ----------------------------------------------------------
+    def capturar(self):
+        ret, imagen = self.video.read()
+        if not ret or imagen is None:
+            return None
+        self.indice += 1
+        return FrameAR(self.indice, imagen)
+
+    def detectar(self, f):
+        if (self.seguidor is not None and self.intervalo_deteccion > 1
+                and f.indice % self.intervalo_deteccion and self.seguidor.activo()):
+            # Frame sin detección: las poses se extrapolan desde el seguidor
+            f.deteccion = DeteccionFrame.desde_prediccion(f.indice, self.seguidor.predecir(f.tiempo), TAM_MARCADOR,
+                                                          self.cameraMatrix, self.distCoeffs)
+        else:
+            f.deteccion = detectar_frame(f.captura, f.indice, self.detector, TAM_MARCADOR,
+                                         self.cameraMatrix, self.distCoeffs)
+
+    def estimar_pose(self, f):
+        poses = f.deteccion.calcular_poses()
+        if self.seguidor is not None and not f.deteccion.predicha:
+            f.deteccion.fijar_poses(self.seguidor.actualizar(poses, f.tiempo))
+
+    def renderizar(self, f):
+        fase = self.state.fase
+        if fase != self.fase:
+            # Al entrar o salir de una fase se liberan sus modelos (los de la mascota se conservan)
+            self.escena.liberar_fase(self.fase)
+            self.escena.liberar_fase(fase)
+            self.fase = fase
+        if self.escena.composicion_gpu:
+            # El frame (con los marcadores ya ocultos) se sube como fondo de la escena
+            f.imagen = self.preparar_imagen(f) if self.ocultar_marcadores else f.captura
+            self.escena.fijar_fondo(f.imagen)
+        f.seleccion = seleccionar_modelos(self.state, f.marcadores)
+        precargar_modelos(self.state, f.marcadores)
+        f.capas = renderizar_modelos(f.seleccion, f.pose, self.escena, fase)
+
+    def preparar_imagen(self, f):
+        imagen = f.captura.copy()
+        if self.ocultar_marcadores:
+            ocultar_marcadores_visualmente(imagen, self.detector, f.deteccion, modo=self.ocultar_marcadores)
+        return imagen
+
+    def componer(self, f):
+        if self.escena.composicion_gpu:
+            # El render ya es el frame compuesto; sin modelos visibles queda la imagen preparada
+            if f.capas:
+                f.imagen = cv2.cvtColor(f.capas[0][0], cv2.COLOR_RGBA2BGR)
+            return
+        f.imagen = componer_capas(self.preparar_imagen(f), f.capas)
+
+    def dibujar_ui(self, f):
+        f.imagen = dibujar_ui(f.imagen, self.state)
+
+    def mostrar(self, f):
+        cv2.imshow(self.titulo, f.imagen)
+
+    # ----------------------------------------------------------
+    # BUCLE
+    # ----------------------------------------------------------
+    def procesar(self):
+        """
+        Ejecuta todas las etapas sobre el siguiente frame.
+        Devuelve el FrameAR procesado o None si no hubo frame disponible.
+        """
+        f = self.capturar()
+        if f is None:
+            return None
+        self.detectar(f)
+        self.estimar_pose(f)
+        self.renderizar(f)
+        self.componer(f)
+        self.dibujar_ui(f)
+        self.mostrar(f)
+        return f
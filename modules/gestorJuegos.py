@@ -1,5 +1,6 @@
 import importlib
 from modules.game_state import GameState
+from models.modelos import precargar_mundo
 
 
 class GestorJuegosAR:
@@ -68,6 +69,8 @@ class GestorJuegosAR:
             self._mostrar("❌ Mundo no reconocido. Di: letras, animales, frutas y verduras, números o final.")
 
     def _cargar_mundo(self, nombre_mundo):
+        # Los modelos del mundo se cargan en segundo plano mientras suena la introducción
+        precargar_mundo(nombre_mundo)
         modulo_nombre = self.mundos_disponibles[nombre_mundo]
         try:
             modulo = importlib.import_module(modulo_nombre)
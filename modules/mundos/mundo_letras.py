@@ -63,9 +63,8 @@ class MundoLetrasAR:
         """
         Inicia uno de los minijuegos disponibles en este mundo.
         """
-        # Limpiar escenas de castillos y modelos previos
-        if hasattr(self.state, "escenas"):
-            self.state.escenas.clear()
+        # Los modelos de castillos y de partidas previas se liberan al cambiar de fase
+        # (FramePipeline.renderizar), en el hilo que dibuja la escena
 
         tipo = tipo.lower()
         if tipo not in self.juegos:
@@ -4,13 +4,20 @@ import face_recognition
 import time
 import random
 
-from models.modelos import crear_modelo, obtener_ruta_por_categoria
-from ar.escena import crear_escena
-from ar.deteccion import detectar_pose
-from utils.conversiones import from_opencv_to_pygfx
-from modules.cuia import alphaBlending
+from models.modelos import crear_modelo, obtener_ruta_por_categoria, cache_assets, precarga, precargar_mundo
+from models.precarga import URGENTE, ESPECULATIVA
+from utils.conversiones import CompositorAlpha
 from modules.game_state import FACE_CASCADE
 
+# Tamaño real del lado de los marcadores ArUco (metros)
+TAM_MARCADOR = 0.19
+
+# Marcador de Tina: aparece en todas las fases, su modelo no se libera al cambiar de fase
+MARCADOR_MASCOTA = 0
+
+# Compositor compartido por todos los frames (reutiliza sus buffers)
+_compositor = CompositorAlpha()
+
 
 # ---------------------------------------------------
 # Funciones auxiliares
@@ -30,15 +37,6 @@ def extraer_vector_facial(frame, face_box):
         return None
 
 
-def detectar_marcadores_disponibles(frame, detector, cameraMatrix, distCoeffs):
-    ret, pose = detectar_pose(frame, 0.19, detector, cameraMatrix, distCoeffs)
-    marcadores_encontrados = set()
-    if ret and pose is not None:
-        for marker_id in pose.keys():
-            marcadores_encontrados.add(marker_id)
-    return marcadores_encontrados
-
-
 def draw_text_with_background(img, text, pos, font_scale=0.7,
                               color=(255, 255, 255), bg_color=(0, 0, 0)):
     font = cv2.FONT_HERSHEY_SIMPLEX
@@ -53,44 +51,107 @@ def draw_text_with_background(img, text, pos, font_scale=0.7,
     cv2.putText(img, text, pos, font, font_scale, color, thickness)
 
 
-def mostrar_modelo(self, categoria, nombre, marker_id, escenas, cameraMatrix, frame):
+def mostrar_modelo(self, categoria, nombre, marker_id, escena):
         ruta = obtener_ruta_por_categoria(categoria, nombre)
         if ruta:
-            modelo = crear_modelo(ruta)
-            escenas[marker_id] = crear_escena(
-                modelo,
-                cameraMatrix,
-                frame.shape[1],
-                frame.shape[0]
-            )
+            escena.agregar(marker_id, crear_modelo(ruta), ruta)
         else:
             print(f"[UIRenderer] No se encontró modelo para {nombre} de {categoria}")
 
 # ---------------------------------------------------
-# Renderizado de realidad mixta
+# Etapas de realidad mixta
 # ---------------------------------------------------
 
-def realidad_mixta(frame, detector, cameraMatrix, distCoeffs, state, escenas):
+def seleccionar_modelos(state, marcadores_actuales):
     """
-    Renderiza los modelos 3D sobre los marcadores según el estado actual.
+    Decide qué modelos se dibujan según la fase actual.
+    Devuelve una lista de tuplas (marker_id, ruta); ruta None reutiliza la escena existente.
     """
-    ret, pose = detectar_pose(frame, 0.19, detector, cameraMatrix, distCoeffs)
-    marcadores_actuales = set(pose.keys()) if ret and pose else set()
+    seleccion = []
 
-    # ---------------------------------------------------
     # Siempre mostrar Tina en marcador 0
-    # ---------------------------------------------------
-    if 0 in marcadores_actuales:
-        if 0 not in escenas:
-            ruta_tina = obtener_ruta_por_categoria("mascota", "tina_unicornio")
-            modelo = crear_modelo(ruta_tina)
-            escenas[0] = crear_escena(modelo, cameraMatrix, frame.shape[1], frame.shape[0])
-        M = from_opencv_to_pygfx(pose[0][0], pose[0][1])
-        escenas[0].actualizar_camara(M)
-        imagen_render = escenas[0].render()
-        imagen_render_bgr = cv2.cvtColor(imagen_render, cv2.COLOR_RGBA2BGRA)
-        frame = alphaBlending(imagen_render_bgr, frame.copy())
+    if MARCADOR_MASCOTA in marcadores_actuales:
+        seleccion.append((MARCADOR_MASCOTA, obtener_ruta_por_categoria("mascota", "tina_unicornio")))
+
+    # Menú principal: castillos en los marcadores configurados
+    if state.fase == "menu_principal":
+        marcadores_castillos = state.marcadores_castillos if hasattr(state, "marcadores_castillos") else {
+            1: "letras", 3: "animales", 4: "fruta_y_verdura", 6: "numeros", 11: "final"
+        }
+        for marker_id, mundo in marcadores_castillos.items():
+            if marker_id in marcadores_actuales:
+                desbloqueado = state.mundos_desbloqueados.get(mundo, False)
+                seleccion.append((marker_id, obtener_ruta_por_categoria("castillo", mundo, desbloqueado)))
 
+    # Mundo_X: solo el castillo del mundo actual (con color)
+    elif state.fase.startswith("mundo_"):
+        mundo = state.fase.split("_", 1)[1]
+        marcador_mundo = next((k for k, v in state.marcadores_castillos.items() if v == mundo), None)
+        if marcador_mundo and marcador_mundo in marcadores_actuales:
+            seleccion.append((marcador_mundo, obtener_ruta_por_categoria("castillo", mundo, True)))
+
+    # Jugando: modelos del mundo activo y cualquier otro marcador con escena
+    elif state.fase == "jugando":
+        mundo_activo = getattr(state, f"instancia_mundo_{state.mundo_actual}", None)
+        modelos_mundo = getattr(mundo_activo, "modelos_a_mostrar", []) if mundo_activo else []
+        for categoria, nombre_modelo, marker_id in modelos_mundo:
+            if marker_id in marcadores_actuales:
+                seleccion.append((marker_id, obtener_ruta_por_categoria(categoria, nombre_modelo)))
+        marcadores_mundo = [m[2] for m in modelos_mundo]
+        for marker_id in marcadores_actuales - {MARCADOR_MASCOTA}:
+            if marker_id not in marcadores_mundo:
+                seleccion.append((marker_id, None))
+
+    return seleccion
+
+
+def precargar_modelos(state, marcadores_actuales):
+    """
+    Adelanta en segundo plano la carga de los mundos cuyos castillos desbloqueados están a la vista
+    en el menú, por si el jugador elige uno de ellos.
+    """
+    if state.fase != "menu_principal":
+        return
+    for marker_id, mundo in state.marcadores_castillos.items():
+        if marker_id in marcadores_actuales and state.mundos_desbloqueados.get(mundo, False):
+            precargar_mundo(mundo, ESPECULATIVA)
+
+
+def renderizar_modelos(seleccion, pose, escena, fase=None):
+    """
+    Renderiza los modelos seleccionados con la pose de su marcador en la escena compartida.
+    Los modelos nuevos quedan asociados a `fase` para liberarlos al cambiar de fase.
+    Devuelve las capas (RGBA, (x, y)) tal como salen de la escena (una sola del renderer 3D, o
+    una por modelo en modo impostor), con la posición de cada rectángulo dentro del frame.
+    """
+    visibles = set()
+    for marker_id, ruta in seleccion:
+        if not escena.activar(marker_id, ruta):
+            if not ruta:
+                continue
+            if precarga is not None and ruta not in cache_assets:
+                # Se carga en segundo plano; el modelo aparece en cuanto esté listo
+                precarga.solicitar(ruta, URGENTE)
+                continue
+            fase_modelo = None if marker_id == MARCADOR_MASCOTA else fase
+            escena.agregar(marker_id, crear_modelo(ruta), ruta, fase_modelo)
+        visibles.add(marker_id)
+    return escena.capas(pose, visibles)
+
+
+def componer_capas(frame, capas):
+    """
+    Mezcla las capas RGBA renderizadas sobre el frame BGR de la cámara (in situ).
+    """
+    for capa, (x, y) in capas:
+        _compositor.componer(frame, capa, x, y, rgba=True)
+    return frame
+
+
+def dibujar_ui(frame, state):
+    """
+    Dibuja los textos y ayudas de la fase actual sobre el frame ya compuesto.
+    """
     # ---------------------------------------------------
     # FASE: INICIO
     # ---------------------------------------------------
@@ -99,12 +160,11 @@ def realidad_mixta(frame, detector, cameraMatrix, distCoeffs, state, escenas):
                                   color=(255, 255, 255), bg_color=(56, 118, 29))
         draw_text_with_background(frame, "Tina: Hola, soy tu amiga mágica. Di 'continuar' para comenzar 🦄", (50, 100),
                                   color=(255, 255, 0), bg_color=(100, 100, 0))
-        return frame
 
     # ---------------------------------------------------
     # FASE: RECONOCIMIENTO FACIAL
     # ---------------------------------------------------
-    if state.fase == "reconocimiento_facial":
+    elif state.fase == "reconocimiento_facial":
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         faces = FACE_CASCADE.detectMultiScale(gray, 1.3, 5)
         if len(faces) > 0:
@@ -129,12 +189,11 @@ def realidad_mixta(frame, detector, cameraMatrix, distCoeffs, state, escenas):
             draw_text_with_background(frame, "Mira a la cámara para comenzar", (50, 50),
                                       color=(255, 255, 255), bg_color=(100, 100, 100))
             state.cara_detectada = False
-        return frame
 
     # ---------------------------------------------------
     # FASE: MENU PRINCIPAL
     # ---------------------------------------------------
-    if state.fase == "menu_principal":
+    elif state.fase == "menu_principal":
         draw_text_with_background(frame, "🏰 Bienvenido a Luminia 🏰", (50, 60),
                                   color=(255, 255, 255), bg_color=(56, 118, 29))
         draw_text_with_background(frame, "Elige el mundo que quieres visitar", (50, 100),
@@ -142,99 +201,23 @@ def realidad_mixta(frame, detector, cameraMatrix, distCoeffs, state, escenas):
         draw_text_with_background(frame, "Di: letras, animales, frutas y verduras, números o final", (50, 140),
                                   color=(255, 255, 255), bg_color=(0, 0, 100))
 
-        # Mostrar los castillos en los marcadores configurados
-        marcadores_castillos = state.marcadores_castillos if hasattr(state, "marcadores_castillos") else {
-            1: "letras", 3: "animales", 4: "fruta_y_verdura", 6: "numeros", 11: "final"
-        }
-
-        for marker_id, mundo in marcadores_castillos.items():
-            if marker_id in marcadores_actuales:
-                desbloqueado = state.mundos_desbloqueados.get(mundo, False)
-                ruta = obtener_ruta_por_categoria("castillo", mundo, desbloqueado)
-                if ruta and marker_id not in escenas:
-                    modelo = crear_modelo(ruta)
-                    escenas[marker_id] = crear_escena(modelo, cameraMatrix, frame.shape[1], frame.shape[0])
-                if marker_id in escenas:
-                    M = from_opencv_to_pygfx(pose[marker_id][0], pose[marker_id][1])
-                    escenas[marker_id].actualizar_camara(M)
-                    imagen_render = escenas[marker_id].render()
-                    imagen_render_bgr = cv2.cvtColor(imagen_render, cv2.COLOR_RGBA2BGRA)
-                    frame = alphaBlending(imagen_render_bgr, frame)
-        return frame
-
     # ---------------------------------------------------
     # FASE: MUNDO_X (letras, animales, frutas, números, final)
     # ---------------------------------------------------
-    if state.fase.startswith("mundo_"):
+    elif state.fase.startswith("mundo_"):
         mundo = state.fase.split("_", 1)[1]
         draw_text_with_background(frame, f"🌈 Estás en el Mundo de las {mundo.replace('_', ' ').capitalize()}",
                                   (50, 60), color=(255, 255, 255), bg_color=(56, 118, 29))
         draw_text_with_background(frame, "Tina: Di el minijuego que quieres jugar o 'salir' para volver.",
                                   (50, 100), color=(255, 255, 0), bg_color=(100, 100, 0))
 
-        # Mostrar solo el castillo del mundo actual (con color)
-        marcador_mundo = next((k for k, v in state.marcadores_castillos.items() if v == mundo), None)
-        if marcador_mundo and marcador_mundo in marcadores_actuales:
-            ruta = obtener_ruta_por_categoria("castillo", mundo, True)
-            if ruta and marcador_mundo not in escenas:
-                modelo = crear_modelo(ruta)
-                escenas[marcador_mundo] = crear_escena(modelo, cameraMatrix, frame.shape[1], frame.shape[0])
-            if marcador_mundo in escenas:
-                M = from_opencv_to_pygfx(pose[marcador_mundo][0], pose[marcador_mundo][1])
-                escenas[marcador_mundo].actualizar_camara(M)
-                imagen_render = escenas[marcador_mundo].render()
-                imagen_render_bgr = cv2.cvtColor(imagen_render, cv2.COLOR_RGBA2BGRA)
-                frame = alphaBlending(imagen_render_bgr, frame)
-        return frame
-
     # ---------------------------------------------------
     # FASE: JUGANDO (delegado al mundo)
     # ---------------------------------------------------
-    if state.fase == "jugando":
+    elif state.fase == "jugando":
         draw_text_with_background(frame, "🎮 Jugando... Di 'salir' para volver al menú", (50, 60),
                                 color=(255, 255, 255), bg_color=(56, 118, 29))
 
-        # Seleccionar la instancia del mundo activo
-        mundo_activo = getattr(state, f"instancia_mundo_{state.mundo_actual}", None)
-
-        if mundo_activo:
-            for categoria, nombre_modelo, marker_id in getattr(mundo_activo, "modelos_a_mostrar", []):
-                if marker_id not in escenas:
-                    ruta = obtener_ruta_por_categoria(categoria, nombre_modelo)
-                    if ruta:
-                        modelo = crear_modelo(ruta)
-                        escenas[marker_id] = crear_escena(modelo, cameraMatrix, frame.shape[1], frame.shape[0])
-                if marker_id in escenas and marker_id in pose:
-                    M = from_opencv_to_pygfx(pose[marker_id][0], pose[marker_id][1])
-                    escenas[marker_id].actualizar_camara(M)
-                    imagen_render = escenas[marker_id].render()
-                    imagen_render_bgr = cv2.cvtColor(imagen_render, cv2.COLOR_RGBA2BGRA)
-                    frame = alphaBlending(imagen_render_bgr, frame)
-
-        # Actualizar cámaras de cualquier otro marcador activo que no esté en modelos_a_mostrar
-        for marker_id in marcadores_actuales - {0}:
-            if marker_id in escenas and (not mundo_activo or marker_id not in [m[2] for m in getattr(mundo_activo, "modelos_a_mostrar", [])]):
-                M = from_opencv_to_pygfx(pose[marker_id][0], pose[marker_id][1])
-                escenas[marker_id].actualizar_camara(M)
-                imagen_render = escenas[marker_id].render()
-                imagen_render_bgr = cv2.cvtColor(imagen_render, cv2.COLOR_RGBA2BGRA)
-                frame = alphaBlending(imagen_render_bgr, frame)
-
-        return frame
-
-    return frame
-
-
-# ---------------------------------------------------
-# Renderizado general de UI
-# ---------------------------------------------------
-
-def render_ui(frame, state, detector, cameraMatrix, distCoeffs, escenas, tts_manager):
-    """
-    Punto central de renderizado que llama a realidad_mixta() y dibuja textos adicionales.
-    """
-    frame = realidad_mixta(frame, detector, cameraMatrix, distCoeffs, state, escenas)
-
     # Mostrar posibles mensajes de error o ayudas contextuales
     if hasattr(state, "error_mensaje") and state.error_mensaje:
         draw_text_with_background(frame, f"⚠️ {state.error_mensaje}", (50, frame.shape[0] - 50),
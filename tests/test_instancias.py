@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+gfx = pytest.importorskip("pygfx")
+la = pytest.importorskip("pylinalg")
+
+from ar.escena import EntradaEscena, GrupoInstancias
+from models.cache_assets import clonar_escena
+
+RUTA = "asset.glb"
+
+
+class Modelo:
+    """Lo mínimo de cuia.modeloGLTF que usa la escena compartida."""
+
+    def __init__(self, model_obj):
+        self.model_obj = model_obj
+        self.indice_animacion = None
+        self.esfera = (0.0, 0.0, 0.0, 1.0)
+
+
+def entradas(posiciones):
+    original = gfx.Group()
+    malla = gfx.Mesh(gfx.box_geometry(1, 1, 1), gfx.MeshBasicMaterial())
+    malla.local.position = (0, 0, 2)
+    original.add(malla)
+    escena = gfx.Scene()
+    resultado = []
+    for x in posiciones:
+        entrada = EntradaEscena(Modelo(clonar_escena(original).scene), RUTA)
+        entrada.ancla.local.matrix = la.mat_from_translation((x, 0, 0))
+        escena.add(entrada.ancla)
+        resultado.append(entrada)
+    return escena, resultado
+
+
+def test_instancias_tras_quitar_el_marcador_que_creo_el_grupo():
+    escena, (creadora, segunda, tercera) = entradas((0.0, 10.0, 20.0))
+    grupo = GrupoInstancias(creadora.modelo.model_obj, 4)
+
+    # El marcador que creó el grupo desaparece: el líder pasa a ser otro clon del asset
+    escena.remove(creadora.ancla)
+    grupo.asignar(segunda, [segunda.ancla, tercera.ancla])
+    grupo.actualizar()
+
+    matrices = grupo.instanciadas[0].instance_buffer.data["matrix"]
+    np.testing.assert_allclose(matrices[0].T[:3, 3], (10, 0, 2), atol=1e-5)
+    np.testing.assert_allclose(matrices[1].T[:3, 3], (20, 0, 2), atol=1e-5)
+    assert not matrices[2:].any()
+
+
+def test_las_instancias_siguen_las_mallas_del_lider():
+    _, (lider, otra) = entradas((0.0, 5.0))
+    grupo = GrupoInstancias(otra.modelo.model_obj, 2)
+    # La animación mueve las mallas del líder, no las del modelo que creó el grupo
+    GrupoInstancias.mallas(lider.modelo.model_obj)[0].local.position = (0, 1, 2)
+    grupo.asignar(lider, [lider.ancla, otra.ancla])
+    grupo.actualizar()
+
+    matrices = grupo.instanciadas[0].instance_buffer.data["matrix"]
+    np.testing.assert_allclose(matrices[0].T[:3, 3], (0, 1, 2), atol=1e-5)
+    np.testing.assert_allclose(matrices[1].T[:3, 3], (5, 1, 2), atol=1e-5)
@@ -8,6 +8,17 @@ def from_opencv_to_pygfx(rvec, tvec):
     pose[1:3] *= -1
     return np.linalg.inv(pose)
 
+def pose_opencv_a_pygfx(rvec, tvec):
+    """
+    Matriz de modelo que sitúa el sistema del marcador delante de una cámara pygfx fija
+    en el origen (la inversa de from_opencv_to_pygfx).
+    """
+    pose = np.eye(4)
+    pose[0:3,3] = np.ravel(tvec)
+    pose[0:3,0:3] = cv2.Rodrigues(rvec)[0]
+    pose[1:3] *= -1
+    return pose
+
 def mezclar_con_alpha(fondo_bgr, overlay_bgra):
     """
     Combina una imagen BGRA (con canal alfa) sobre un fondo BGR usando alpha blending.
@@ -28,3 +39,64 @@ def mezclar_con_alpha(fondo_bgr, overlay_bgra):
     # Mezcla: out = overlay * alpha + fondo * (1 - alpha)
     resultado = overlay_rgb * alpha + fondo * (1 - alpha)
     return resultado.astype(np.uint8)
+
+
+class CompositorAlpha:
+    """
+    Mezcla capas BGRA/RGBA sobre un fondo BGR in situ, con aritmética float32 de OpenCV.
+    Solo trabaja dentro del rectángulo no transparente de la capa y reutiliza sus buffers
+    entre llamadas, por lo que no reserva memoria por frame.
+    """
+
+    def __init__(self):
+        self._alpha = np.empty(0, dtype=np.uint8)
+        self._color = np.empty(0, dtype=np.uint8)
+        self._pesos = np.empty(0, dtype=np.float32)
+        self._pesos_inv = np.empty(0, dtype=np.float32)
+
+    @staticmethod
+    def _vista(buffer, forma):
+        # Vista contigua de los primeros elementos del buffer (se amplía si no cabe)
+        n = int(np.prod(forma))
+        if buffer.size < n:
+            buffer = np.empty(n, dtype=buffer.dtype)
+        return buffer, buffer[:n].reshape(forma)
+
+    def componer(self, fondo_bgr, capa, x=0, y=0, rgba=False):
+        """
+        Mezcla `capa` (BGRA, o RGBA si rgba=True) sobre `fondo_bgr` con su esquina superior
+        izquierda en (x, y). Modifica el fondo y lo devuelve.
+        """
+        if capa.shape[2] != 4:
+            raise ValueError("La capa debe tener 4 canales (BGRA o RGBA)")
+
+        # Recortamos la capa a la parte que cae dentro del fondo
+        alto, ancho = fondo_bgr.shape[:2]
+        cx1, cy1 = max(0, -x), max(0, -y)
+        cx2 = min(capa.shape[1], ancho - x)
+        cy2 = min(capa.shape[0], alto - y)
+        if cx2 <= cx1 or cy2 <= cy1:
+            return fondo_bgr
+        capa = capa[cy1:cy2, cx1:cx2]
+        x, y = x + cx1, y + cy1
+
+        # Rectángulo que contiene todos los píxeles no transparentes
+        self._alpha, alpha = self._vista(self._alpha, capa.shape[:2])
+        cv2.extractChannel(capa, 3, dst=alpha)
+        bx, by, bw, bh = cv2.boundingRect(alpha)
+        if bw == 0 or bh == 0:
+            return fondo_bgr
+        capa = capa[by:by + bh, bx:bx + bw]
+        alpha = alpha[by:by + bh, bx:bx + bw]
+        fondo = fondo_bgr[y + by:y + by + bh, x + bx:x + bx + bw]
+
+        self._color, color = self._vista(self._color, (bh, bw, 3))
+        cv2.cvtColor(capa, cv2.COLOR_RGBA2BGR if rgba else cv2.COLOR_BGRA2BGR, dst=color)
+        self._pesos, pesos = self._vista(self._pesos, (bh, bw))
+        self._pesos_inv, pesos_inv = self._vista(self._pesos_inv, (bh, bw))
+        np.multiply(alpha, np.float32(1.0 / 255.0), out=pesos)
+        np.subtract(np.float32(1.0), pesos, out=pesos_inv)
+
+        # out = capa * alpha + fondo * (1 - alpha), escrito directamente sobre el fondo
+        cv2.blendLinear(color, fondo, pesos, pesos_inv, dst=fondo)
+        return fondo_bgr